@@ -1,2 +1,29 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+
 from app.models import Base
-from app.core.config import DATABASE_URL
\ No newline at end of file
+from app.database import engine
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_online():
+    # The app's engine unless a URL was configured explicitly, e.g. by tests
+    url = config.get_main_option("sqlalchemy.url")
+    connectable = create_engine(url) if url else engine
+    with connectable.connect() as connection:
+        # Batch mode lets the same migrations alter constraints on SQLite, which has no ALTER CONSTRAINT
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    raise SystemExit("Offline (--sql) migrations aren't supported: the migrations inspect the live schema")
+run_migrations_online()
@@ -0,0 +1,45 @@
+"""Index universities.created_at and check academic_rigor
+
+The catalog refresher polls max(created_at) as its change watermark and re-reads the rows
+written since, so the column is indexed. The academic_rigor check was misspelt in the
+models ("academic rigor"), so tables created without it get it here. Databases that
+create_all built from the current models already have both; each step checks first.
+
+Revision ID: 3f1c2a7d9b04
+Revises:
+Create Date: 2026-10-17 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '3f1c2a7d9b04'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+TABLE = "universities"
+CREATED_AT_INDEX = "ix_universities_created_at"
+# PostgreSQL's name for the model's unnamed column check
+RIGOR_CHECK = "universities_academic_rigor_check"
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(TABLE):
+        # Nothing to migrate: create_all builds the table from the models
+        return
+    if CREATED_AT_INDEX not in {index["name"] for index in inspector.get_indexes(TABLE)}:
+        op.create_index(CREATED_AT_INDEX, TABLE, ["created_at"])
+    checks = inspector.get_check_constraints(TABLE)
+    if not any("academic_rigor" in check["sqltext"] for check in checks):
+        # On SQLite the batch recreates the table, which drops unnamed checks unless passed back in
+        unnamed = [sa.CheckConstraint(check["sqltext"]) for check in checks if check["name"] is None]
+        with op.batch_alter_table(TABLE, table_args=unnamed) as batch_op:
+            batch_op.create_check_constraint(RIGOR_CHECK, "academic_rigor BETWEEN 1 AND 5")
+
+
+def downgrade():
+    # The academic_rigor check stays: the models always meant to have it
+    op.drop_index(CREATED_AT_INDEX, table_name=TABLE)
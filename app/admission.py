@@ -0,0 +1,97 @@
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from .core.config import MATCH_MAX_CONCURRENCY, MATCH_MAX_QUEUE
+from .metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTIONS, MATCH_COALESCED
+
+T = TypeVar("T")
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed: the wait queue is full or its deadline passed while queued."""
+
+
+class AdmissionController:
+    """
+    Caps concurrent computations at `max_concurrency`; up to `max_queue` more wait for a
+    slot, anything beyond that is rejected immediately instead of piling onto the DB pool.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.waiting = 0
+        self.active = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @asynccontextmanager
+    async def slot(self, timeout: float):
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            ADMISSION_REJECTIONS.labels("queue_full").inc()
+            raise Overloaded("Server is busy, try again shortly")
+
+        self.waiting += 1
+        ADMISSION_QUEUE_DEPTH.set(self.waiting)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            ADMISSION_REJECTIONS.labels("deadline").inc()
+            raise Overloaded("Timed out waiting for capacity, try again shortly") from None
+        finally:
+            self.waiting -= 1
+            ADMISSION_QUEUE_DEPTH.set(self.waiting)
+
+        self.active += 1
+        ADMISSION_IN_FLIGHT.set(self.active)
+        try:
+            yield
+        finally:
+            self.active -= 1
+            ADMISSION_IN_FLIGHT.set(self.active)
+            self._semaphore.release()
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: callers with the same key share one task.
+    Each caller waits at most its own `timeout`; the shared task is cancelled only once
+    every caller waiting on it has given up.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]], timeout: float) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(partial(self._forget, key))
+        else:
+            MATCH_COALESCED.inc()
+        self._waiters[key] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            ADMISSION_REJECTIONS.labels("deadline").inc()
+            raise Overloaded("Request deadline exceeded, try again shortly") from None
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0:
+                    task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case every caller already gave up
+
+
+match_admission = AdmissionController(MATCH_MAX_CONCURRENCY, MATCH_MAX_QUEUE)
+match_flight = SingleFlight()
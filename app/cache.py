@@ -0,0 +1,147 @@
+import hashlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from .catalog import invalidate_catalog
+from .core.config import MATCH_CACHE_ENABLED, MATCH_CACHE_SIZE, MATCH_CACHE_TTL, UNIVERSITY_CACHE_SIZE
+from .utils import MatchCriteria, MatchSet
+
+
+class CacheBackend(ABC):
+    """
+    Minimal key/value interface the match cache stores results in.
+    Values are MatchSet tuples (picklable), so an out-of-process store such as Redis
+    can implement this by serializing them.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class LRUCache(CacheBackend):
+    """Thread-safe in-process LRU with an optional per-entry TTL (ttl <= 0 disables expiry)."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.evictions += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def make_match_cache_key(criteria: MatchCriteria, limit: int, after: Optional[Tuple[float, int]] = None,
+                         version: int = 0) -> str:
+    """
+    Stable string key for a normalized preference set (order of multi-select answers doesn't matter).
+    `version` is the data version the result was computed from.
+    """
+    payload = json.dumps([list(criteria), limit, after, version], separators=(",", ":"))
+    return "match:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MatchCache:
+    """Caches MatchSet results of get_university_matches keyed on MatchCriteria and the data version."""
+
+    def __init__(self, backend: CacheBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, criteria: MatchCriteria, limit: int,
+            after: Optional[Tuple[float, int]] = None, version: int = 0) -> Optional[MatchSet]:
+        if not self.enabled:
+            return None
+        value = self.backend.get(make_match_cache_key(criteria, limit, after, version))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return MatchSet(*value)
+
+    def set(self, criteria: MatchCriteria, limit: int, after: Optional[Tuple[float, int]], match_set: MatchSet,
+            version: int = 0):
+        if self.enabled:
+            self.backend.set(make_match_cache_key(criteria, limit, after, version), match_set)
+
+    def invalidate(self):
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": getattr(self.backend, "evictions", 0),
+            "size": len(self.backend) if hasattr(self.backend, "__len__") else -1,
+        }
+
+
+match_cache = MatchCache(LRUCache(maxsize=MATCH_CACHE_SIZE, ttl=MATCH_CACHE_TTL), enabled=MATCH_CACHE_ENABLED)
+
+
+# id -> UniversityType for university(id) / universities(ids). The objects are never mutated
+# after construction, so every request can share them. The TTL bounds staleness in workers
+# that don't see an explicit invalidation.
+university_cache = LRUCache(maxsize=UNIVERSITY_CACHE_SIZE, ttl=MATCH_CACHE_TTL)
+
+
+def set_match_cache_backend(backend: CacheBackend):
+    """Swaps the match cache store, e.g. for a shared cache across workers."""
+    match_cache.backend = backend
+
+
+def invalidate_match_caches():
+    """Drops cached match results, cached universities and the in-memory catalog after the universities table changes."""
+    match_cache.invalidate()
+    university_cache.clear()
+    invalidate_catalog()
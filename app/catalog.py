@@ -0,0 +1,462 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .core.config import CATALOG_REFRESH_OVERLAP
+from .core.config import CATALOG_SHARED_DIR, CATALOG_SHARED_KEEP
+from .crud import get_catalog_rows, get_catalog_watermark
+from .database import SessionLocal, run_db_in_thread
+from .index import BitsetIndex
+from .metrics import stage
+from .shared_catalog import SharedCatalogStore
+from .utils import COST_MATCH_BONUS, MatchCriteria, MatchSet
+
+# Rating columns, in the same order as MatchCriteria.weights
+RATING_COLUMNS = ("academic_rigor", "hostel_quality", "sports_facilities", "social_life")
+# Low-cardinality text columns stored as integer codes
+CATEGORICAL_COLUMNS = ("specialty", "ownership", "state", "geopolitical_region")
+
+
+def _bounds(values: Sequence[Optional[int]], missing: float) -> np.ndarray:
+    # NULL bounds are unbounded: -inf for a minimum, +inf for a maximum
+    return np.array([missing if v is None else v for v in values], dtype=np.float64)
+
+
+def _student_bounds(range_: Tuple[Optional[int], Optional[int]]) -> Tuple[float, float]:
+    low, high = range_
+    return (-np.inf if low is None else float(low), np.inf if high is None else float(high))
+
+
+def top_k(scores: np.ndarray, ids: np.ndarray, k: int) -> np.ndarray:
+    """Returns positions of the k best scores, ordered by score desc then id asc."""
+    n = scores.size
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    keep = np.arange(n)
+    if k < n:
+        # Keep everything tied with the k-th best score so the id tie-break stays deterministic
+        kth = np.partition(scores, n - k)[n - k]
+        keep = np.flatnonzero(scores >= kth)
+    order = np.lexsort((ids[keep], -scores[keep]))[:k]
+    return keep[order]
+
+
+def _columns_from_rows(rows: Sequence, vocabularies: Dict[str, Dict[str, int]]) -> Dict[str, np.ndarray]:
+    """Column arrays for `rows`; unseen categorical values are added to `vocabularies`."""
+    columns = {
+        "ids": np.array([row.id for row in rows], dtype=np.int64),
+        "ratings": np.array(
+            [[getattr(row, column) or 0 for column in RATING_COLUMNS] for row in rows], dtype=np.float64
+        ).reshape(len(rows), len(RATING_COLUMNS)),
+        "tuition_min": _bounds([row.tuition_min for row in rows], -np.inf),
+        "tuition_max": _bounds([row.tuition_max for row in rows], np.inf),
+        "cost_min": _bounds([row.cost_of_living_min for row in rows], -np.inf),
+        "cost_max": _bounds([row.cost_of_living_max for row in rows], np.inf),
+    }
+    for column in CATEGORICAL_COLUMNS:
+        vocab = vocabularies[column]
+        columns[column] = np.array(
+            [vocab.setdefault(getattr(row, column), len(vocab)) for row in rows], dtype=np.int32
+        )
+    return columns
+
+
+NUMERIC_COLUMNS = ("ids", "ratings", "tuition_min", "tuition_max", "cost_min", "cost_max")
+
+
+class Catalog:
+    """
+    Columnar, read-only snapshot of the universities table used for matching.
+    Ratings and ranges are NumPy arrays and categorical columns are integer coded,
+    with a bitset inverted index over the codes for candidate selection, so
+    filtering and scoring a request is a handful of vector operations.
+    """
+
+    def __init__(self, ids: np.ndarray, ratings: np.ndarray,
+                 tuition_min: np.ndarray, tuition_max: np.ndarray,
+                 cost_min: np.ndarray, cost_max: np.ndarray,
+                 codes: Dict[str, np.ndarray], vocabularies: Dict[str, Dict[str, int]],
+                 index: Optional[BitsetIndex] = None,
+                 value_counts: Optional[Dict[str, np.ndarray]] = None):
+        self.ids = ids
+        self.ratings = ratings
+        self.tuition_min = tuition_min
+        self.tuition_max = tuition_max
+        self.cost_min = cost_min
+        self.cost_max = cost_max
+        self.codes = codes
+        self.vocabularies = vocabularies
+        self.index = index or BitsetIndex.build(codes, self.vocab_sizes())
+        self._positions: Optional[Dict[int, int]] = None
+        # (max(created_at), row count) of the table this snapshot reflects; set by the loader
+        self.watermark: Optional[Tuple] = None
+        # meta.json of the shared snapshot this catalog is mapped from (name, version, changed_ids)
+        self.snapshot: Optional[Dict] = None
+        # Browse aggregates, built on first use: per-code counts (kept up to date by
+        # with_rows), the facet lists derived from them, and ranked id views
+        self._value_counts = value_counts
+        self._facets: Optional[Dict[str, List[Tuple[str, int]]]] = None
+        self._rankings: Dict[Tuple[str, Optional[str]], np.ndarray] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Sequence) -> "Catalog":
+        """Builds a catalog from rows shaped like crud.get_catalog_rows results."""
+        vocabularies: Dict[str, Dict[str, int]] = {column: {} for column in CATEGORICAL_COLUMNS}
+        columns = _columns_from_rows(rows, vocabularies)
+        return cls(
+            **{name: columns[name] for name in NUMERIC_COLUMNS},
+            codes={column: columns[column] for column in CATEGORICAL_COLUMNS},
+            vocabularies=vocabularies,
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Every array backing the catalog, including the index, keyed by a flat name."""
+        arrays = {name: getattr(self, name) for name in NUMERIC_COLUMNS}
+        arrays.update({f"codes_{column}": codes for column, codes in self.codes.items()})
+        arrays.update({f"index_{column}": bits for column, bits in self.index.bitsets.items()})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], vocabularies: Dict[str, Dict[str, int]]) -> "Catalog":
+        """Inverse of to_arrays; the arrays are used as is (e.g. memory-mapped), not copied."""
+        return cls(
+            **{name: arrays[name] for name in NUMERIC_COLUMNS},
+            codes={column: arrays[f"codes_{column}"] for column in CATEGORICAL_COLUMNS},
+            vocabularies=vocabularies,
+            index=BitsetIndex(len(arrays["ids"]), {column: arrays[f"index_{column}"] for column in CATEGORICAL_COLUMNS}),
+        )
+
+    def __len__(self) -> int:
+        return int(self.ids.size)
+
+    def vocab_sizes(self) -> Dict[str, int]:
+        return {column: len(vocab) for column, vocab in self.vocabularies.items()}
+
+    def position_of(self, university_id: int) -> Optional[int]:
+        if self._positions is None:
+            self._positions = {int(uni_id): i for i, uni_id in enumerate(self.ids)}
+        return self._positions.get(university_id)
+
+    def with_rows(self, rows: Sequence) -> "Catalog":
+        """
+        Returns a new catalog with `rows` inserted or replaced by id (copy-on-write:
+        self is not modified). The bitset index is patched for the touched positions only.
+        """
+        latest = {row.id: row for row in rows}
+        rows = list(latest.values())
+        if not rows:
+            return self
+        vocabularies = {column: dict(vocab) for column, vocab in self.vocabularies.items()}
+        changed = _columns_from_rows(rows, vocabularies)
+
+        existing = np.array([-1 if (pos := self.position_of(row.id)) is None else pos for row in rows],
+                            dtype=np.intp)
+        is_update = existing >= 0
+        size = len(self) + int((~is_update).sum())
+        positions = existing.copy()
+        positions[~is_update] = np.arange(len(self), size)
+
+        arrays = {}
+        for name in NUMERIC_COLUMNS + CATEGORICAL_COLUMNS:
+            current = self.codes[name] if name in self.codes else getattr(self, name)
+            grown = np.concatenate([current, changed[name][~is_update]])
+            grown[positions[is_update]] = changed[name][is_update]
+            arrays[name] = grown
+
+        old_codes = {}
+        for column in CATEGORICAL_COLUMNS:
+            old = np.full(len(rows), -1, dtype=np.int32)
+            old[is_update] = self.codes[column][existing[is_update]]
+            old_codes[column] = old
+        new_codes = {column: changed[column] for column in CATEGORICAL_COLUMNS}
+        vocab_sizes = {column: len(vocab) for column, vocab in vocabularies.items()}
+
+        value_counts = None
+        if self._value_counts is not None:
+            # Move the touched rows from their old value's count to the new one
+            value_counts = {}
+            for column in CATEGORICAL_COLUMNS:
+                counts = np.zeros(vocab_sizes[column], dtype=np.int64)
+                counts[:self._value_counts[column].size] = self._value_counts[column]
+                old = old_codes[column]
+                counts -= np.bincount(old[old >= 0], minlength=vocab_sizes[column])
+                counts += np.bincount(new_codes[column], minlength=vocab_sizes[column])
+                value_counts[column] = counts
+
+        return Catalog(
+            **{name: arrays[name] for name in NUMERIC_COLUMNS},
+            codes={column: arrays[column] for column in CATEGORICAL_COLUMNS},
+            vocabularies=vocabularies,
+            index=self.index.updated(positions, old_codes, new_codes, size, vocab_sizes),
+            value_counts=value_counts,
+        )
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held by the column arrays and the inverted index."""
+        columns = sum(getattr(self, name).nbytes for name in NUMERIC_COLUMNS)
+        columns += sum(codes.nbytes for codes in self.codes.values())
+        return {"columns": columns, "index": self.index.nbytes}
+
+    def value_counts(self) -> Dict[str, np.ndarray]:
+        """Number of universities per code of each categorical column."""
+        if self._value_counts is None:
+            sizes = self.vocab_sizes()
+            self._value_counts = {
+                column: np.bincount(self.codes[column], minlength=sizes[column]) for column in CATEGORICAL_COLUMNS
+            }
+        return self._value_counts
+
+    def facets(self) -> Dict[str, List[Tuple[str, int]]]:
+        """(value, count) per categorical column, most common first. Built once per catalog."""
+        if self._facets is None:
+            facets = {}
+            for column, counts in self.value_counts().items():
+                values = list(self.vocabularies[column])  # insertion order is code order
+                codes = sorted(np.flatnonzero(counts), key=lambda code: (-counts[code], values[code]))
+                facets[column] = [(values[code], int(counts[code])) for code in codes]
+            self._facets = facets
+        return self._facets
+
+    def ranked_ids(self, column: str, state: Optional[str] = None) -> np.ndarray:
+        """
+        Ids ordered by a rating column (desc, missing ratings last) then id, optionally
+        within one state. Each view is sorted once per catalog and then sliced.
+        """
+        key = (column, state)
+        ranked = self._rankings.get(key)
+        if ranked is None:
+            if state is None:
+                positions = np.arange(len(self))
+            elif state in self.vocabularies["state"]:
+                positions = self.index.positions(self._union("state", [state]))
+            else:
+                # Not cached: unknown states come straight from client input
+                return np.empty(0, dtype=np.int64)
+            ratings = self.ratings[positions, RATING_COLUMNS.index(column)]
+            ranked = self.ids[positions][np.lexsort((self.ids[positions], -ratings))]
+            self._rankings[key] = ranked
+        return ranked
+
+    def _union(self, column: str, values: Sequence[str]) -> np.ndarray:
+        vocab = self.vocabularies[column]
+        return self.index.union(column, [vocab[v] for v in values if v in vocab])
+
+    def candidate_positions(self, criteria: MatchCriteria) -> np.ndarray:
+        """Primary filter: specialty AND ownership AND (state OR region), evaluated on bitsets."""
+        bits = (
+            self._union("specialty", criteria.specialties)
+            & self._union("ownership", criteria.ownerships)
+            & (self._union("state", criteria.states) | self._union("geopolitical_region", criteria.regions))
+        )
+        return self.index.positions(bits)
+
+    def match(self, criteria: MatchCriteria, limit: int = 10,
+              after: Optional[Tuple[float, int]] = None) -> MatchSet:
+        """
+        Scores every candidate passing the primary filter and returns the page of `limit`
+        matches ranked after the (score, id) position `after`.
+        Falls back to ranking by tuition distance when no candidate's tuition overlaps.
+        """
+        with stage("filter"):
+            positions = self.candidate_positions(criteria)
+            if positions.size == 0:
+                return MatchSet(matches=[], fallback=False)
+
+            tuition_low, tuition_high = _student_bounds(criteria.tuition_range)
+            uni_min = self.tuition_min[positions]
+            uni_max = self.tuition_max[positions]
+            tuition_match = (uni_max >= tuition_low) & (uni_min <= tuition_high)
+
+        fallback = not tuition_match.any()
+        with stage("fallback" if fallback else "score"):
+            if not fallback:
+                # --- SECONDARY FILTERING (Tuition) and SCORE CALCULATION ---
+                positions = positions[tuition_match]
+                cost_low, cost_high = _student_bounds(criteria.cost_range)
+                cost_match = (self.cost_max[positions] >= cost_low) & (self.cost_min[positions] <= cost_high)
+                weights = np.array(criteria.weights, dtype=np.float64)
+                scores = self.ratings[positions] @ weights + COST_MATCH_BONUS * cost_match
+            elif np.isinf(tuition_high):
+                scores = np.zeros(positions.size)
+            else:
+                # Vectorized calculate_tuition_difference: distance above the student's max,
+                # else distance below the student's min; the closest university scores highest
+                difference = np.where(
+                    uni_min > tuition_high, uni_min - tuition_high,
+                    np.where(uni_max < tuition_low, tuition_low - uni_max, 0.0),
+                )
+                scores = 0.0 - difference
+
+            ids = self.ids[positions]
+            total_count = int(ids.size)
+            if after is not None:
+                # Keyset pagination: keep only what ranks after the cursor, no re-sort of earlier pages
+                after_score, after_id = after
+                remaining = (scores < after_score) | ((scores == after_score) & (ids > after_id))
+                scores, ids = scores[remaining], ids[remaining]
+
+            best = top_k(scores, ids, limit)
+        return MatchSet(
+            matches=[(int(ids[i]), float(scores[i])) for i in best],
+            fallback=fallback,
+            total_count=total_count,
+            has_next_page=bool(ids.size > limit),
+        )
+
+
+# --- Process-wide catalog ---
+_catalog: Optional[Catalog] = None
+_catalog_lock = asyncio.Lock()
+
+
+def load_catalog(db: Session) -> Catalog:
+    """Builds a fresh catalog from the database."""
+    # Read the watermark first: anything written meanwhile is picked up by the next refresh
+    watermark = get_catalog_watermark(db)
+    catalog = Catalog.from_rows(get_catalog_rows(db))
+    catalog.watermark = watermark
+    return catalog
+
+
+def apply_catalog_changes(db: Session, catalog: Catalog, watermark: Tuple) -> Tuple[Catalog, Optional[List[int]]]:
+    """
+    Returns a catalog brought up to `watermark` plus the ids that changed (None after a
+    full rebuild). Only rows written since the catalog's own watermark are read; deletes
+    can't be applied incrementally, so a row count mismatch falls back to a rebuild.
+    """
+    since = catalog.watermark[0] if catalog.watermark else None
+    if since is None:
+        return load_catalog(db), None
+    rows = get_catalog_rows(db, changed_since=since - timedelta(seconds=CATALOG_REFRESH_OVERLAP))
+    updated = catalog.with_rows(rows)
+    if len(updated) != watermark[1]:
+        return load_catalog(db), None
+    updated.watermark = watermark
+    return updated, [row.id for row in rows]
+
+
+def current_catalog() -> Optional[Catalog]:
+    """The loaded catalog, or None; never triggers a load."""
+    return _catalog
+
+
+def swap_catalog(expected: Catalog, catalog: Catalog) -> bool:
+    """
+    Publishes `catalog` if `expected` is still the current one. Readers holding the old
+    snapshot keep using it; nothing is mutated in place.
+    """
+    global _catalog
+    if _catalog is not expected:
+        return False
+    _catalog = catalog
+    return True
+
+
+async def get_catalog() -> Catalog:
+    """
+    Returns the in-memory catalog, building it from the database on first use
+    (or attaching to the shared snapshot when CATALOG_SHARED_DIR is set).
+    """
+    global _catalog
+    catalog = _catalog
+    if catalog is None:
+        async with _catalog_lock:
+            if _catalog is None:
+                if _shared_store is not None:
+                    _catalog = await asyncio.to_thread(_load_shared_catalog)
+                else:
+                    _catalog = await run_db_in_thread(load_catalog)
+                usage = _catalog.memory_usage()
+                print(f"Catalog loaded: {len(_catalog)} universities, "
+                      f"columns {usage['columns'] / 1024:.1f} KiB, index {usage['index'] / 1024:.1f} KiB")
+            catalog = _catalog
+    return catalog
+
+
+# --- Shared snapshots (one copy per host, memory-mapped by every worker) ---
+_shared_store = SharedCatalogStore(CATALOG_SHARED_DIR, CATALOG_SHARED_KEEP) if CATALOG_SHARED_DIR else None
+
+
+def shared_catalog_enabled() -> bool:
+    return _shared_store is not None
+
+
+def _encode_watermark(watermark: Optional[Tuple]) -> Optional[list]:
+    if watermark is None:
+        return None
+    max_created_at, count = watermark
+    return [max_created_at.isoformat() if max_created_at is not None else None, count]
+
+
+def _decode_watermark(value: Optional[list]) -> Optional[Tuple]:
+    if value is None:
+        return None
+    max_created_at, count = value
+    return (datetime.fromisoformat(max_created_at) if max_created_at is not None else None, count)
+
+
+def attach_shared_catalog(known: Optional[str] = None,
+                          store: Optional[SharedCatalogStore] = None) -> Optional[Catalog]:
+    """
+    Maps the current shared snapshot (zero-copy). Returns None if there is none yet,
+    or if it is still the snapshot named `known`. `store` defaults to CATALOG_SHARED_DIR's.
+    """
+    store = store or _shared_store
+    name = store.current_name()
+    if name is None or name == known:
+        return None
+    arrays, meta = store.read(name)
+    vocabularies = {column: {value: code for code, value in enumerate(values)}
+                    for column, values in meta["vocabularies"].items()}
+    catalog = Catalog.from_arrays(arrays, vocabularies)
+    catalog.watermark = _decode_watermark(meta["watermark"])
+    catalog.snapshot = meta
+    return catalog
+
+
+def _publish(catalog: Catalog, changed_ids: Optional[List[int]], store: Optional[SharedCatalogStore] = None) -> str:
+    return (store or _shared_store).publish(catalog.to_arrays(), {
+        # Vocabulary lists are in code order
+        "vocabularies": {column: list(vocab) for column, vocab in catalog.vocabularies.items()},
+        "watermark": _encode_watermark(catalog.watermark),
+        "changed_ids": changed_ids,
+    })
+
+
+def publish_catalog(catalog: Catalog, changed_ids: Optional[List[int]] = None,
+                    store: Optional[SharedCatalogStore] = None) -> str:
+    """Writes `catalog` as the new shared snapshot; `changed_ids` None means every row may have changed."""
+    store = store or _shared_store
+    with store.lock():
+        return _publish(catalog, changed_ids, store)
+
+
+def try_lead_shared_catalog() -> bool:
+    """True in the one worker per host that polls the database and publishes snapshots."""
+    return _shared_store.try_lead()
+
+
+def _load_shared_catalog() -> Catalog:
+    catalog = attach_shared_catalog()
+    if catalog is not None:
+        return catalog
+    # First worker up builds and publishes; the others wait on the lock and then attach
+    with _shared_store.lock():
+        catalog = attach_shared_catalog()
+        if catalog is None:
+            db = SessionLocal()
+            try:
+                _publish(load_catalog(db), None)
+            finally:
+                db.close()
+            catalog = attach_shared_catalog()
+    return catalog
+
+
+def invalidate_catalog():
+    """Drops the in-memory catalog so the next request rebuilds it from the database."""
+    global _catalog
+    _catalog = None
@@ -5,3 +5,59 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Matching engine: "catalog" (in-memory columnar catalog) or "sql" (filter and rank in the database)
+MATCH_BACKEND = os.getenv("MATCH_BACKEND", "catalog")
+
+# --- Database pool / driver settings ---
+DB_ASYNC = os.getenv("DB_ASYNC", "true").lower() in ("1", "true", "yes")  # Use asyncpg/AsyncSession when available
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))  # 0 disables the timeout
+# Threads for the sync fallback; defaults to the pool capacity so threads never wait on connections
+DB_THREADPOOL_SIZE = int(os.getenv("DB_THREADPOOL_SIZE", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+# --- Match result cache ---
+MATCH_CACHE_ENABLED = os.getenv("MATCH_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+MATCH_CACHE_SIZE = int(os.getenv("MATCH_CACHE_SIZE", "4096"))
+MATCH_CACHE_TTL = float(os.getenv("MATCH_CACHE_TTL", "300"))  # Seconds; 0 disables expiry
+
+# --- Catalog refresh ---
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "5"))  # Seconds between watermark polls; 0 disables
+# Changed rows are re-read this far behind the last watermark, to catch transactions that
+# committed after a newer one (created_at is the transaction start time) and coarse SQLite timestamps
+CATALOG_REFRESH_OVERLAP = float(os.getenv("CATALOG_REFRESH_OVERLAP", "5"))
+# A transaction running longer than the overlap still slips under the watermark, so the catalog
+# (and the name index) are also rebuilt in full this often; 0 disables
+CATALOG_RECONCILE_INTERVAL = float(os.getenv("CATALOG_RECONCILE_INTERVAL", "300"))
+
+# Directory for catalog snapshots shared by all workers on a host (e.g. /dev/shm/myuni-catalog).
+# Unset: every worker builds and refreshes its own catalog in memory.
+CATALOG_SHARED_DIR = os.getenv("CATALOG_SHARED_DIR")
+CATALOG_SHARED_KEEP = int(os.getenv("CATALOG_SHARED_KEEP", "3"))  # Old snapshots kept for workers still swapping
+
+# --- matchUniversities admission control ---
+MATCH_MAX_CONCURRENCY = int(os.getenv("MATCH_MAX_CONCURRENCY", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+MATCH_MAX_QUEUE = int(os.getenv("MATCH_MAX_QUEUE", "64"))  # Waiting requests beyond this are rejected at once
+MATCH_DEADLINE_MS = int(os.getenv("MATCH_DEADLINE_MS", "5000"))  # Queueing plus computation
+
+# Largest page size clients may request from matchUniversities
+MAX_MATCH_LIMIT = int(os.getenv("MAX_MATCH_LIMIT", "100"))
+# Most ids a single universities(ids) lookup may ask for
+MAX_LOOKUP_IDS = int(os.getenv("MAX_LOOKUP_IDS", "100"))
+# Shared UniversityType objects kept for id lookups (cleared whenever the table changes)
+UNIVERSITY_CACHE_SIZE = int(os.getenv("UNIVERSITY_CACHE_SIZE", "10000"))
+
+# --- Persisted queries ---
+# "apq": clients may send only a sha256 hash, unknown operations are registered on first use
+# "allowlist": only operations listed in PERSISTED_QUERIES_FILE are executed
+# "off": no persisted query handling or document caching
+PERSISTED_QUERIES_MODE = os.getenv("PERSISTED_QUERIES_MODE", "apq")
+PERSISTED_QUERIES_FILE = os.getenv("PERSISTED_QUERIES_FILE")  # JSON {sha256: query} or [query, ...]
+PERSISTED_QUERIES_CACHE_SIZE = int(os.getenv("PERSISTED_QUERIES_CACHE_SIZE", "1000"))
+
+# --- Metrics ---
+# Operation names always used as the `operation` label (comma separated), besides the persisted query allowlist
+METRICS_OPERATION_NAMES = [name.strip() for name in os.getenv("METRICS_OPERATION_NAMES", "").split(",") if name.strip()]
+# Other operation names get their own label until this many have been seen; later ones are "other"
+METRICS_MAX_OPERATION_LABELS = int(os.getenv("METRICS_MAX_OPERATION_LABELS", "50"))
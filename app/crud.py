@@ -1,9 +1,159 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, case, func, literal, or_, select, true
 from sqlalchemy.orm import Session
 from . import models
+from .utils import COST_MATCH_BONUS, MatchCriteria, MatchSet
 
 def get_all_universities(db: Session):
     """Fetches all universities from the database"""
     return db.query(models.University).all()
 
+def get_catalog_watermark(db: Session) -> Tuple[Optional[datetime], int]:
+    """(max(created_at), row count): changes whenever a row is inserted, updated or deleted"""
+    University = models.University
+    max_created_at, count = db.query(func.max(University.created_at), func.count(University.id)).one()
+    return max_created_at, count
+
+def get_catalog_rows(db: Session, changed_since: Optional[datetime] = None):
+    """
+    Fetches only the columns the matching catalog needs, as plain rows (no ORM hydration).
+    With `changed_since`, only rows written at or after that time are returned.
+    """
+    University = models.University
+    query = db.query(
+        University.id,
+        University.specialty,
+        University.ownership,
+        University.state,
+        University.geopolitical_region,
+        University.academic_rigor,
+        University.hostel_quality,
+        University.sports_facilities,
+        University.social_life,
+        University.tuition_min,
+        University.tuition_max,
+        University.cost_of_living_min,
+        University.cost_of_living_max,
+    )
+    if changed_since is not None:
+        query = query.filter(University.created_at >= changed_since)
+    return query.all()
+
+def get_university_names(db: Session, changed_since: Optional[datetime] = None):
+    """(id, name) rows for the name search index; with `changed_since`, only rows written at or after that time"""
+    University = models.University
+    query = db.query(University.id, University.name)
+    if changed_since is not None:
+        query = query.filter(University.created_at >= changed_since)
+    return query.all()
+
+def get_universities_by_ids(db: Session, ids: List[int]):
+    """Fetches the universities with the given ids (in no particular order)"""
+    if not ids:
+        return []
+    return db.query(models.University).filter(models.University.id.in_(ids)).all()
+
+# --- Database-side matching (MATCH_BACKEND = "sql") ---
+
+def _primary_filter(criteria: MatchCriteria):
+    """
+    specialty AND ownership AND (state OR region), expanded so each branch lines up
+    with a composite index: (specialty, state) -> ix_university_specialty_state,
+    (geopolitical_region, ...) -> ix_university_location.
+    """
+    University = models.University
+    return and_(
+        University.ownership.in_(criteria.ownerships),
+        or_(
+            and_(University.specialty.in_(criteria.specialties), University.state.in_(criteria.states)),
+            and_(University.geopolitical_region.in_(criteria.regions), University.specialty.in_(criteria.specialties)),
+        ),
+    )
+
+def _range_overlap(uni_min, uni_max, student_range: Tuple[Optional[int], Optional[int]]):
+    """SQL version of utils.ranges_overlap: NULL bounds on either side are unbounded."""
+    student_min, student_max = student_range
+    clauses = []
+    if student_min is not None:
+        clauses.append(or_(uni_max.is_(None), uni_max >= student_min))
+    if student_max is not None:
+        clauses.append(or_(uni_min.is_(None), uni_min <= student_max))
+    return and_(true(), *clauses)
+
+def _tuition_difference(student_range: Tuple[Optional[int], Optional[int]]):
+    """SQL version of utils.calculate_tuition_difference."""
+    University = models.University
+    student_min, student_max = student_range
+    if student_max is None:
+        return literal(0.0)
+    whens = [(University.tuition_min > student_max, University.tuition_min - student_max)]
+    if student_min is not None:
+        whens.append((University.tuition_max < student_min, student_min - University.tuition_max))
+    return case(*whens, else_=0)
+
+def _match_score(criteria: MatchCriteria):
+    University = models.University
+    academic, hostel, sports, social_life = criteria.weights
+    return (
+        academic * func.coalesce(University.academic_rigor, 0)
+        + hostel * func.coalesce(University.hostel_quality, 0)
+        + sports * func.coalesce(University.sports_facilities, 0)
+        + social_life * func.coalesce(University.social_life, 0)
+        + case(
+            (_range_overlap(University.cost_of_living_min, University.cost_of_living_max, criteria.cost_range), COST_MATCH_BONUS),
+            else_=0,
+        )
+    ).label("score")
+
+def _match_filters(criteria: MatchCriteria, fallback: bool = False):
+    """Primary filter, plus tuition overlap unless ranking the fallback."""
+    University = models.University
+    filters = [_primary_filter(criteria)]
+    if not fallback:
+        filters.append(_range_overlap(University.tuition_min, University.tuition_max, criteria.tuition_range))
+    return filters
+
+def build_match_query(criteria: MatchCriteria, limit: int = 10,
+                      after: Optional[Tuple[float, int]] = None, fallback: bool = False):
+    """
+    SELECT id, score for the page of `limit` universities ranked after the (score, id)
+    cursor position `after`. With fallback=True, ranks primary matches by how close
+    their tuition is to the student's range instead.
+    """
+    University = models.University
+    if fallback:
+        score = (0.0 - _tuition_difference(criteria.tuition_range)).label("score")
+    else:
+        score = _match_score(criteria)
+    query = select(University.id, score).where(*_match_filters(criteria, fallback))
+    if after is not None:
+        after_score, after_id = after
+        query = query.where(or_(score < after_score, and_(score == after_score, University.id > after_id)))
+    return query.order_by(score.desc(), University.id).limit(limit)
+
+def count_matches(db: Session, criteria: MatchCriteria, fallback: bool = False) -> int:
+    University = models.University
+    return db.execute(select(func.count(University.id)).where(*_match_filters(criteria, fallback))).scalar()
+
+def get_top_matches(db: Session, criteria: MatchCriteria, limit: int = 10,
+                    after: Optional[Tuple[float, int]] = None) -> MatchSet:
+    """Filters, scores and ranks in the database; only one page of rows is returned."""
+    fallback = False
+    total_count = count_matches(db, criteria)
+    if not total_count:
+        total_count = count_matches(db, criteria, fallback=True)
+        fallback = bool(total_count)
+    if not total_count:
+        return MatchSet(matches=[], fallback=False)
+    # One extra row tells us whether there is a next page
+    rows = db.execute(build_match_query(criteria, limit + 1, after, fallback)).all()
+    return MatchSet(
+        matches=[(row.id, float(row.score)) for row in rows[:limit]],
+        fallback=fallback,
+        total_count=total_count,
+        has_next_page=len(rows) > limit,
+    )
+
 # Add more specific query functions here if needed for optimization or other features
-# e.g., get_universities_by_state(db: Session, state: str)
\ No newline at end of file
+# e.g., get_universities_by_state(db: Session, state: str)
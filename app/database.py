@@ -1,15 +1,89 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from .core.config import DATABASE_URL
+from .core.config import (
+    DATABASE_URL, DB_ASYNC, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS, DB_THREADPOOL_SIZE,
+)
 
-engine = create_engine(DATABASE_URL)
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def _engine_options(url, is_async: bool) -> dict:
+    """Pool and timeout options for the given URL; SQLite only gets pre-ping."""
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if url.get_backend_name() != "postgresql":
+        return options
+    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+    if DB_STATEMENT_TIMEOUT_MS:
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+def _create_async_engine(url):
+    """Async engine for the URL's backend, or None if disabled or the async driver isn't installed."""
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if not DB_ASYNC or driver is None:
+        return None
+    async_url = url.set(drivername=driver)
+    try:
+        return create_async_engine(async_url, **_engine_options(async_url, is_async=True))
+    except ImportError:
+        return None
+
+_url = make_url(DATABASE_URL)
+if _url.drivername == "postgresql":
+    # psycopg2 is the sync driver in requirements.txt; newer SQLAlchemy defaults to psycopg 3
+    _url = _url.set(drivername="postgresql+psycopg2")
+engine = create_engine(_url, **_engine_options(_url, is_async=False))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = _create_async_engine(_url)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False) if async_engine is not None else None
 Base = declarative_base()
 
+# Bounded pool for running sync sessions off the event loop when no async driver is available
+_db_executor = ThreadPoolExecutor(max_workers=DB_THREADPOOL_SIZE, thread_name_prefix="db")
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def _run_in_session(fn, *args, **kwargs):
+    db = SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Runs `fn(session, *args, **kwargs)` without blocking the event loop.
+    Uses the async engine (AsyncSession.run_sync) when available, otherwise a sync
+    session on the bounded DB thread pool. `fn` is a plain crud function either way.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(fn, *args, **kwargs)
+    return await run_db_in_thread(fn, *args, **kwargs)
+
+async def run_db_in_thread(fn, *args, **kwargs):
+    """
+    Runs `fn(session, *args, **kwargs)` with a sync session on the bounded DB thread pool,
+    even when the async engine is available. AsyncSession.run_sync executes `fn` on the
+    event loop thread, so anything doing real Python work besides the queries (building
+    the catalog or the name index from every row) must go through here instead.
+    """
+    loop = asyncio.get_running_loop()
+    # Carry context variables (e.g. per-request metrics) into the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_db_executor, partial(context.run, _run_in_session, fn, *args, **kwargs))
@@ -0,0 +1,71 @@
+from typing import Dict, Sequence
+
+import numpy as np
+
+
+def _bit_masks(positions: np.ndarray) -> np.ndarray:
+    # np.packbits is big-endian within a byte: position 0 is the 0x80 bit
+    return (np.uint8(0x80) >> (positions & 7).astype(np.uint8)).astype(np.uint8)
+
+
+class BitsetIndex:
+    """
+    Inverted index from categorical codes to packed bitsets of catalog positions.
+    bitsets[column] is a (distinct values x ceil(size / 8)) uint8 matrix, so the
+    candidates for a multi-select preference are a few byte-wise OR/AND operations.
+    """
+
+    def __init__(self, size: int, bitsets: Dict[str, np.ndarray]):
+        self.size = size
+        self.bitsets = bitsets
+
+    @classmethod
+    def build(cls, codes: Dict[str, np.ndarray], vocab_sizes: Dict[str, int]) -> "BitsetIndex":
+        size = len(next(iter(codes.values()))) if codes else 0
+        positions = np.arange(size)
+        bitsets = {}
+        for column, column_codes in codes.items():
+            bits = np.zeros((vocab_sizes[column], (size + 7) // 8), dtype=np.uint8)
+            np.bitwise_or.at(bits, (column_codes, positions >> 3), _bit_masks(positions))
+            bitsets[column] = bits
+        return cls(size, bitsets)
+
+    def updated(self, positions: np.ndarray, old_codes: Dict[str, np.ndarray],
+                new_codes: Dict[str, np.ndarray], size: int, vocab_sizes: Dict[str, int]) -> "BitsetIndex":
+        """
+        Returns a new index with `positions` moved from `old_codes` (-1 for newly appended
+        positions) to `new_codes`. Only the touched bits are rewritten; self is unchanged.
+        """
+        nbytes = (size + 7) // 8
+        masks = _bit_masks(positions)
+        bitsets = {}
+        for column, bits in self.bitsets.items():
+            grown = np.zeros((vocab_sizes[column], nbytes), dtype=np.uint8)
+            grown[:bits.shape[0], :bits.shape[1]] = bits
+            existed = old_codes[column] >= 0
+            np.bitwise_and.at(
+                grown, (old_codes[column][existed], positions[existed] >> 3), ~masks[existed]
+            )
+            np.bitwise_or.at(grown, (new_codes[column], positions >> 3), masks)
+            bitsets[column] = grown
+        return BitsetIndex(size, bitsets)
+
+    def union(self, column: str, codes: Sequence[int]) -> np.ndarray:
+        """Bitset of positions whose `column` has any of `codes`."""
+        bits = self.bitsets[column]
+        if len(codes) == 0:
+            return np.zeros(bits.shape[1], dtype=np.uint8)
+        return np.bitwise_or.reduce(bits[list(codes)], axis=0)
+
+    def positions(self, bitset: np.ndarray) -> np.ndarray:
+        """Sorted positions set in `bitset`; only non-zero bytes are unpacked."""
+        nonzero = np.flatnonzero(bitset)
+        if nonzero.size == 0:
+            return np.empty(0, dtype=np.intp)
+        bits = np.unpackbits(bitset[nonzero]).reshape(-1, 8).astype(bool)
+        positions = (nonzero[:, None] * 8 + np.arange(8))[bits]
+        return positions[positions < self.size]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(bits.nbytes for bits in self.bitsets.values())
@@ -0,0 +1,10 @@
+from typing import Dict
+
+from strawberry.dataloader import DataLoader
+
+from .resolvers import load_universities
+
+
+async def get_context() -> Dict:
+    """Per-request GraphQL context; a fresh loader batches and dedupes the lookups of one operation."""
+    return {"university_loader": DataLoader(load_fn=load_universities)}
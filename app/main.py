@@ -1,20 +1,72 @@
+import orjson
 import strawberry
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from strawberry.fastapi import GraphQLRouter
 from .schemas import Query # Import your Query definition
-from .database import Base, engine # Import Base and engine for migrations
+from .database import Base, engine, async_engine # Import Base and engine for migrations
+from .cache import match_cache, university_cache
+from .loaders import get_context
+from .metrics import MetricsExtension, instrument_engine, register_known_operations, register_stats_collector
+from .persisted_queries import PersistedQueryExtension, persisted_queries
+from .refresh import catalog_refresher
+from .core.config import CATALOG_REFRESH_INTERVAL, PERSISTED_QUERIES_MODE
 
 # Create DB tables if they don't exist (use Alembic for production)
 # Base.metadata.create_all(bind=engine) # Comment out if using Alembic manages tables
 
 # Create the GraphQL schema
-schema = strawberry.Schema(query=Query) # Add mutation=Mutation if you have mutations
+# The persisted query extension runs first so unknown hashes are rejected before anything else starts
+extensions = [MetricsExtension]
+if PERSISTED_QUERIES_MODE != "off":
+    extensions.insert(0, PersistedQueryExtension)
+
+# Errors that are part of normal operation: load shedding and persisted query handshakes/rejections.
+# Clients get them in the response; only the others are logged (with a traceback) by Strawberry.
+EXPECTED_ERROR_CODES = {
+    "OVERLOADED", "PERSISTED_QUERY_NOT_FOUND", "PERSISTED_QUERY_HASH_MISMATCH", "OPERATION_NOT_ALLOWLISTED",
+}
+
+class Schema(strawberry.Schema):
+    def process_errors(self, errors, execution_context=None):
+        unexpected = [error for error in errors if (error.extensions or {}).get("code") not in EXPECTED_ERROR_CODES]
+        super().process_errors(unexpected, execution_context)
+
+schema = Schema(query=Query, extensions=extensions) # Add mutation=Mutation if you have mutations
+
+# Count and time SQL statements on both engines
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
+# Allowlisted operation names always get their own metric label; other names only up to a bound
+register_known_operations(persisted_queries.operation_names())
+register_stats_collector("match_cache", match_cache.stats)
+register_stats_collector("persisted_queries", persisted_queries.stats)
+register_stats_collector("university_cache", lambda: {"size": len(university_cache),
+                                                      "evictions": university_cache.evictions})
+
+# GraphQL router with orjson (de)serialization instead of the stdlib json module
+class ORJSONGraphQLRouter(GraphQLRouter):
+    def decode_json(self, data):
+        return orjson.loads(data)
+
+    def encode_json(self, data) -> bytes:
+        return orjson.dumps(data)
 
 # Create the GraphQL router
-graphql_app = GraphQLRouter(schema)
+graphql_app = ORJSONGraphQLRouter(schema, context_getter=get_context)
+
+# Keep the in-memory catalog in step with the database while the app runs
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if CATALOG_REFRESH_INTERVAL > 0:
+        catalog_refresher.start()
+    yield
+    await catalog_refresher.stop()
 
 # Create the FastAPI app
-app = FastAPI(title="FindMyUni API")
+app = FastAPI(title="FindMyUni API", lifespan=lifespan)
 
 # Include the GraphQL router
 app.include_router(graphql_app, prefix="/graphql")
@@ -24,11 +76,12 @@ app.include_router(graphql_app, prefix="/graphql")
 async def root():
     return {"message": "Welcome to the FindMyUni API. Go to /graphql for the GraphQL interface."}
 
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 # --- Alembic Setup ---
-# 1. Install alembic: pip install alembic
-# 2. Initialize: alembic init alembic
-# 3. Configure alembic/env.py:
-#    - Set `target_metadata = Base.metadata` (import Base from your models)
-#    - Configure `sqlalchemy.url = DATABASE_URL` (import from core.config)
-# 4. Generate migration: alembic revision --autogenerate -m "Initial university table"
-# 5. Apply migration: alembic upgrade head
\ No newline at end of file
+# Migrations live in alembic/versions and read DATABASE_URL through alembic/env.py.
+# Apply them with: alembic upgrade head
+# New migration: alembic revision --autogenerate -m "<change>"
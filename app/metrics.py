@@ -0,0 +1,126 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from strawberry.extensions import SchemaExtension
+
+from .core.config import METRICS_MAX_OPERATION_LABELS, METRICS_OPERATION_NAMES
+
+# --- Metric definitions ---
+GRAPHQL_PHASE_SECONDS = Histogram(
+    "graphql_phase_seconds", "Time spent per GraphQL operation phase", ["operation", "phase"]
+)
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "Time spent executing a single SQL statement")
+DB_QUERIES_PER_OPERATION = Histogram(
+    "db_queries_per_operation", "SQL statements issued per GraphQL operation",
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+MATCH_STAGE_SECONDS = Histogram(
+    "match_stage_seconds", "Time spent per get_university_matches stage", ["stage"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+MATCH_FALLBACKS = Counter(
+    "match_fallback_total", "Match computations that found no tuition overlap and used the fallback ranking"
+)
+ADMISSION_QUEUE_DEPTH = Gauge("match_admission_queue_depth", "matchUniversities requests waiting for a slot")
+ADMISSION_IN_FLIGHT = Gauge("match_admission_in_flight", "matchUniversities computations running")
+ADMISSION_REJECTIONS = Counter(
+    "match_admission_rejected_total", "matchUniversities requests shed by admission control", ["reason"]
+)
+MATCH_COALESCED = Counter("match_coalesced_total", "matchUniversities requests served by an identical in-flight one")
+
+# Operation names are client supplied, so only registered names and the first
+# METRICS_MAX_OPERATION_LABELS others become `operation` label values; the rest are "other"
+_known_operations: Set[str] = set(METRICS_OPERATION_NAMES)
+_seen_operations: Set[str] = set()
+
+# Per-operation SQL statement counter; a one-element list so copies of the context share it
+_query_count: ContextVar[Optional[List[int]]] = ContextVar("query_count", default=None)
+
+
+def register_known_operations(names: Iterable[str]):
+    """Adds operation names (e.g. the persisted query allowlist) that may be used as metric labels."""
+    _known_operations.update(names)
+
+
+def operation_label(name: Optional[str]) -> str:
+    """The `operation` label value for an operation name."""
+    if name is None:
+        return "anonymous"
+    if name in _known_operations or name in _seen_operations:
+        return name
+    if len(_seen_operations) < METRICS_MAX_OPERATION_LABELS:
+        _seen_operations.add(name)
+        return name
+    return "other"
+
+
+@contextmanager
+def stage(name: str):
+    """Times a block into match_stage_seconds{stage=name}."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        MATCH_STAGE_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine):
+    """Counts and times every statement a (sync) SQLAlchemy engine executes."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERY_SECONDS.observe(time.perf_counter() - conn.info["query_started"].pop())
+        count = _query_count.get()
+        if count is not None:
+            count[0] += 1
+
+
+class MetricsExtension(SchemaExtension):
+    """Records parse/validate/execute timings and the SQL statement count per GraphQL operation."""
+
+    def _operation(self) -> str:
+        return operation_label(self.execution_context.operation_name)
+
+    def _timed(self, phase: str):
+        started = time.perf_counter()
+        yield
+        GRAPHQL_PHASE_SECONDS.labels(self._operation(), phase).observe(time.perf_counter() - started)
+
+    def on_operation(self):
+        token = _query_count.set([0])
+        yield from self._timed("total")
+        DB_QUERIES_PER_OPERATION.observe(_query_count.get()[0])
+        _query_count.reset(token)
+
+    def on_parse(self):
+        yield from self._timed("parse")
+
+    def on_validate(self):
+        yield from self._timed("validate")
+
+    def on_execute(self):
+        yield from self._timed("execute")
+
+
+class _StatsCollector:
+    def __init__(self, prefix: str, stats_fn: Callable[[], Dict[str, float]]):
+        self.prefix = prefix
+        self.stats_fn = stats_fn
+
+    def collect(self):
+        for key, value in self.stats_fn().items():
+            yield GaugeMetricFamily(f"{self.prefix}_{key}", f"{self.prefix} {key}", value=value)
+
+
+def register_stats_collector(prefix: str, stats_fn: Callable[[], Dict[str, float]]):
+    """Exposes a stats() style dict (e.g. match cache counters) as gauges, read at scrape time."""
+    REGISTRY.register(_StatsCollector(prefix, stats_fn))
@@ -13,7 +13,7 @@ class University(Base):
     ownership = Column(String(50), nullable=False, index=True)
     type = Column(String(50))
 
-    academic_rigor = Column(Integer, CheckConstraint('academic rigor BETWEEN 1 AND 5'))
+    academic_rigor = Column(Integer, CheckConstraint('academic_rigor BETWEEN 1 AND 5'))
     sports_facilities = Column(Integer, CheckConstraint('sports_facilities BETWEEN 1 AND 5'))
     hostel_quality = Column(Integer, CheckConstraint('hostel_quality BETWEEN 1 AND 5'))
     social_life = Column(Integer, CheckConstraint('social_life BETWEEN 1 AND 5'))
@@ -31,7 +31,8 @@ class University(Base):
     source_url_1 = Column(String(512))
     source_url_2 = Column(String(512))
 
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Bumped on every write; the catalog refresher polls it as a change watermark
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
 
     __table_args__ = (
         # Example composite index for location-based searches
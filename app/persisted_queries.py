@@ -0,0 +1,123 @@
+import hashlib
+import json
+from typing import Dict, Optional, Set
+
+from graphql import DocumentNode, GraphQLError, OperationDefinitionNode, parse
+from strawberry.extensions import SchemaExtension
+
+from .cache import LRUCache
+from .core.config import PERSISTED_QUERIES_CACHE_SIZE, PERSISTED_QUERIES_FILE, PERSISTED_QUERIES_MODE
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class PersistedQuery:
+    """A registered operation with its parsed document and validation status, filled in on first use."""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.document: Optional[DocumentNode] = None
+        self.validated = False
+
+
+class PersistedQueryStore:
+    """
+    sha256 -> PersistedQuery. Allowlisted operations are pinned; operations registered
+    at runtime (automatic persisted queries) live in a bounded LRU.
+    """
+
+    def __init__(self, maxsize: int, allowlist: Optional[Dict[str, str]] = None):
+        self._registered = LRUCache(maxsize=maxsize)
+        self._allowlist = {digest: PersistedQuery(query) for digest, query in (allowlist or {}).items()}
+
+    @classmethod
+    def from_file(cls, path: Optional[str], maxsize: int) -> "PersistedQueryStore":
+        """Loads an allowlist manifest: a JSON object of {sha256: query} or a JSON list of queries."""
+        if not path:
+            return cls(maxsize)
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, list):
+            manifest = {query_hash(query): query for query in manifest}
+        return cls(maxsize, manifest)
+
+    def get(self, digest: str) -> Optional[PersistedQuery]:
+        return self._allowlist.get(digest) or self._registered.get(digest)
+
+    def operation_names(self) -> Set[str]:
+        """Names of the allowlisted operations; runtime registrations are client controlled and not included."""
+        names = set()
+        for entry in self._allowlist.values():
+            for definition in parse(entry.query).definitions:
+                if isinstance(definition, OperationDefinitionNode) and definition.name is not None:
+                    names.add(definition.name.value)
+        return names
+
+    def register(self, digest: str, query: str) -> PersistedQuery:
+        entry = PersistedQuery(query)
+        self._registered.set(digest, entry)
+        return entry
+
+    def stats(self) -> Dict[str, int]:
+        return {"allowlisted": len(self._allowlist), "registered": len(self._registered),
+                "evictions": self._registered.evictions}
+
+
+persisted_queries = PersistedQueryStore.from_file(PERSISTED_QUERIES_FILE, PERSISTED_QUERIES_CACHE_SIZE)
+
+
+def _error(message: str, code: str) -> GraphQLError:
+    return GraphQLError(message, extensions={"code": code})
+
+
+class PersistedQueryExtension(SchemaExtension):
+    """
+    Automatic persisted queries (Apollo protocol: extensions.persistedQuery.sha256Hash)
+    plus parsed/validated document caching for every operation.
+    In "allowlist" mode only operations already in the store are executed.
+    """
+
+    def on_operation(self):
+        context = self.execution_context
+        persisted = (context.operation_extensions or {}).get("persistedQuery") or {}
+        requested_hash = persisted.get("sha256Hash")
+
+        if context.query is None:
+            if not requested_hash:
+                # Nothing to look up; Strawberry reports the missing query
+                self.entry = None
+                yield
+                return
+            self.entry = persisted_queries.get(requested_hash)
+            if self.entry is None:
+                raise _error("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+            context.query = self.entry.query
+        else:
+            digest = query_hash(context.query)
+            if requested_hash and requested_hash != digest:
+                raise _error("provided sha does not match query", "PERSISTED_QUERY_HASH_MISMATCH")
+            self.entry = persisted_queries.get(digest)
+            if self.entry is None:
+                if PERSISTED_QUERIES_MODE == "allowlist":
+                    raise _error("Operation is not in the allowlist", "OPERATION_NOT_ALLOWLISTED")
+                self.entry = persisted_queries.register(digest, context.query)
+        yield
+
+    def on_parse(self):
+        context = self.execution_context
+        if self.entry is not None and self.entry.document is not None:
+            context.graphql_document = self.entry.document
+        yield
+        if self.entry is not None and self.entry.document is None:
+            self.entry.document = context.graphql_document
+
+    def on_validate(self):
+        context = self.execution_context
+        if self.entry is not None and self.entry.validated:
+            # Validation depends only on the document and the schema; skip it for known-good operations
+            context.pre_execution_errors = []
+        yield
+        if self.entry is not None and not self.entry.validated and context.pre_execution_errors == []:
+            self.entry.validated = True
@@ -0,0 +1,125 @@
+import asyncio
+import time
+from typing import List, Optional, Tuple
+
+from .cache import university_cache
+from .catalog import (
+    apply_catalog_changes, attach_shared_catalog, current_catalog, get_catalog, load_catalog, publish_catalog,
+    shared_catalog_enabled, swap_catalog, try_lead_shared_catalog,
+)
+from .core.config import CATALOG_RECONCILE_INTERVAL, CATALOG_REFRESH_INTERVAL
+from .crud import get_catalog_watermark
+from .database import run_db, run_db_in_thread
+
+
+class CatalogRefresher:
+    """
+    Polls a cheap (max(created_at), count) watermark and, when it moves, applies only the
+    changed rows to the in-memory catalog with a copy-on-write swap, so readers never wait.
+    `version` increases on every observed change; caches key on it so entries computed
+    from older data simply stop being hit. Every `reconcile_interval` seconds the catalog
+    is rebuilt in full instead, catching writes the watermark can't see.
+
+    With shared snapshots, only the leader worker polls the database and publishes; every
+    worker swaps to a new snapshot when CURRENT changes, and `version` is the snapshot's.
+    """
+
+    def __init__(self, interval: float, reconcile_interval: float = CATALOG_RECONCILE_INTERVAL):
+        self.interval = interval
+        self.reconcile_interval = reconcile_interval
+        self.reconciled_at = time.monotonic()
+        self.version = 0
+        self.watermark: Optional[Tuple] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _forget_universities(self, changed_ids: Optional[List[int]]):
+        if changed_ids is None:
+            university_cache.clear()
+        else:
+            for uni_id in changed_ids:
+                university_cache.delete(uni_id)
+
+    def _reconcile_due(self) -> bool:
+        return self.reconcile_interval > 0 and time.monotonic() - self.reconciled_at >= self.reconcile_interval
+
+    async def _updated_catalog(self, catalog, watermark: Tuple):
+        """(catalog, changed ids or None after a full rebuild) for a catalog that is behind or due a reconcile."""
+        if self._reconcile_due():
+            # created_at is the writing transaction's start time, so a long transaction can commit a
+            # row below the watermark without changing the row count; only a full rebuild sees it
+            updated, changed_ids = await run_db_in_thread(load_catalog), None
+        else:
+            updated, changed_ids = await run_db_in_thread(apply_catalog_changes, catalog, watermark)
+        if changed_ids is None:
+            self.reconciled_at = time.monotonic()
+        return updated, changed_ids
+
+    async def refresh(self) -> bool:
+        """Checks the watermark once; returns True if the table changed since the last check."""
+        if shared_catalog_enabled():
+            return await self._refresh_shared()
+        watermark = await run_db(get_catalog_watermark)
+        catalog = current_catalog()
+        changed_ids = None
+        rebuilt = False
+        if catalog is not None and (catalog.watermark != watermark or self._reconcile_due()):
+            updated, changed_ids = await self._updated_catalog(catalog, watermark)
+            if swap_catalog(catalog, updated):
+                rebuilt = changed_ids is None
+                if rebuilt:
+                    print(f"Catalog rebuilt: {len(updated)} universities")
+                elif changed_ids:
+                    print(f"Catalog refreshed: {len(changed_ids)} changed rows, {len(updated)} universities")
+
+        if watermark == self.watermark and not rebuilt:
+            return False
+        self.watermark = watermark
+        self.version += 1
+        self._forget_universities(changed_ids)
+        return True
+
+    async def _refresh_shared(self) -> bool:
+        catalog = await get_catalog()
+        if try_lead_shared_catalog():
+            watermark = await run_db(get_catalog_watermark)
+            if catalog.watermark != watermark or self._reconcile_due():
+                updated, changed_ids = await self._updated_catalog(catalog, watermark)
+                name = await asyncio.to_thread(publish_catalog, updated, changed_ids)
+                print(f"Catalog snapshot {name} published: {len(updated)} universities")
+
+        attached = await asyncio.to_thread(attach_shared_catalog, catalog.snapshot["name"])
+        if attached is not None and swap_catalog(catalog, attached):
+            catalog = attached
+        version = catalog.snapshot["version"]
+        if version == self.version:
+            return False
+        # Per-row invalidation only holds if no snapshot was skipped
+        self._forget_universities(catalog.snapshot["changed_ids"] if version == self.version + 1 else None)
+        self.version = version
+        return True
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Keep serving the current snapshot; the next poll retries
+                print(f"Catalog refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+catalog_refresher = CatalogRefresher(CATALOG_REFRESH_INTERVAL)
@@ -1,106 +1,201 @@
-import math
-from typing import List, Optional, Dict
-from sqlalchemy.orm import Session
-from .schemas import StudentPreferenceInput, MatchResult, UniversityType
-from .models import University
-from .utils import parse_db_range_string, ranges_overlap, calculate_tuition_difference
-from .database import SessionLocal
-
-from .crud import get_all_universities
+from functools import partial
+from typing import Dict, Iterable, List, Optional, Set
+from strawberry.types import Info
+from strawberry.types.nodes import SelectedField
+from strawberry.utils.str_converters import to_camel_case
+from . import schemas
+from .utils import MatchSet, build_match_criteria, decode_cursor, encode_cursor
+from .database import run_db
+from .catalog import get_catalog
+from .admission import match_admission, match_flight
+from .cache import make_match_cache_key, match_cache, university_cache
+from .refresh import catalog_refresher
+from .search import get_name_index
+from .metrics import MATCH_FALLBACKS, stage
+from .core.config import MATCH_BACKEND, MATCH_DEADLINE_MS, MAX_MATCH_LIMIT
+
+from .crud import get_top_matches, get_universities_by_ids
+
+# UniversityType attribute -> University column it is loaded from
+UNIVERSITY_TYPE_COLUMNS = {
+    "id": "id",
+    "name": "name",
+    "geopolitical_region": "geopolitical_region",
+    "state": "state",
+    "specialty": "specialty",
+    "ownership": "ownership",
+    "type": "type",
+    "academic_rigor": "academic_rigor",
+    "sports_facilities": "sports_facilities",
+    "hostel_quality": "hostel_quality",
+    "social_life": "social_life",
+    # Use the stored string representations for display
+    "tuition_display": "tuition_category_str",
+    "cost_of_living_display": "cost_category_str",
+    "source_url_1": "source_url_1",
+    "source_url_2": "source_url_2",
+}
+_GRAPHQL_UNIVERSITY_FIELDS = {to_camel_case(field): field for field in UNIVERSITY_TYPE_COLUMNS}
+
+def _selected_names(selections: Iterable, path: tuple) -> Set[str]:
+    """GraphQL field names selected at `path` below `selections`, looking through fragments."""
+    names: Set[str] = set()
+    for selection in selections:
+        if not isinstance(selection, SelectedField):
+            names |= _selected_names(selection.selections, path)
+        elif not path:
+            names.add(selection.name)
+        elif selection.name == path[0]:
+            names |= _selected_names(selection.selections, path[1:])
+    return names
+
+def selected_university_fields(info: Info, path: tuple = ()) -> Set[str]:
+    """UniversityType attributes the client selected at `path` below the current field."""
+    names = _selected_names(info.selected_fields[0].selections, path)
+    return {_GRAPHQL_UNIVERSITY_FIELDS[name] for name in names if name in _GRAPHQL_UNIVERSITY_FIELDS}
+
+async def get_university_matches(preferences: "schemas.StudentPreferenceInput", limit: int = 10,
+                                 after: Optional[str] = None,
+                                 university_fields: Optional[Set[str]] = None) -> "schemas.MatchConnection":
+    """
+    One page of university matches for the student's preferences, best first, paged with
+    an opaque (score, id) cursor. Raises Overloaded when the server is too busy to compute it.
+    """
+    if not 1 <= limit <= MAX_MATCH_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_MATCH_LIMIT}")
+    after_position = decode_cursor(after) if after else None
+
+    criteria = build_match_criteria(preferences)
+    version = catalog_refresher.version
+    ids_only = university_fields is not None and university_fields <= {"id"}
+    # Cached pages are cheap to serve, so only misses are coalesced and go through admission control
+    match_set = match_cache.get(criteria, limit, after_position, version)
+    if match_set is not None:
+        return await _build_match_connection(match_set, ids_only)
+
+    deadline = MATCH_DEADLINE_MS / 1000
+    key = (make_match_cache_key(criteria, limit, after_position, version), ids_only)
+    compute = partial(_compute_matches, criteria, limit, after_position, version, ids_only, deadline)
+    return await match_flight.do(key, compute, deadline)
+
+async def _compute_matches(criteria, limit: int, after_position, version: int, ids_only: bool,
+                           deadline: float) -> "schemas.MatchConnection":
+    """
+    Computes a page that wasn't cached. Identical concurrent requests share one call
+    (match_flight), and the call waits for a slot from admission control first.
+    """
+    async with match_admission.slot(deadline):
+        match_set = await _find_matches(criteria, limit, after_position, version)
+        return await _build_match_connection(match_set, ids_only)
 
-async def get_university_matches(preferences: StudentPreferenceInput) -> List[MatchResult]:
+async def _find_matches(criteria, limit: int, after_position, version: int) -> MatchSet:
+    """
+    Runs the configured matching engine for one page and caches the result: the in-memory
+    columnar catalog, or the database when MATCH_BACKEND is "sql" (through run_db, so the
+    event loop never blocks on I/O).
+    """
+    if MATCH_BACKEND == "sql":
+        with stage("fetch"):
+            match_set = await run_db(get_top_matches, criteria, limit, after_position)
+    else:
+        with stage("fetch"):
+            catalog = await get_catalog()
+        # filter / score / fallback stages are timed inside Catalog.match
+        match_set = catalog.match(criteria, limit=limit, after=after_position)
+    if match_set.fallback:
+        MATCH_FALLBACKS.inc()
+    match_cache.set(criteria, limit, after_position, match_set, version)
+    return match_set
+
+async def _build_match_connection(match_set: MatchSet, ids_only: bool) -> "schemas.MatchConnection":
+    """
+    Turns a page of (id, score) matches into the GraphQL connection. Display objects are
+    looked up afterwards, for this page's ids only, through the shared university cache;
+    when the client selected nothing but ids, nothing is loaded at all.
+    """
+    unis_by_id = {}
+    if not ids_only and match_set.matches:
+        universities = await load_universities([uni_id for uni_id, _ in match_set.matches])
+        unis_by_id = {university.id: university for university in universities if university is not None}
+
+    with stage("format"):
+        results = _format_matches(match_set, unis_by_id, ids_only)
+
+    end_cursor = None
+    if match_set.matches:
+        last_id, last_score = match_set.matches[-1]
+        end_cursor = encode_cursor(last_score, last_id)
+    return schemas.MatchConnection(
+        matches=results,
+        total_count=match_set.total_count,
+        page_info=schemas.PageInfo(has_next_page=match_set.has_next_page, end_cursor=end_cursor),
+    )
+
+async def get_facets() -> "schemas.Facets":
+    """University counts per specialty / ownership / state / region, from the catalog's precomputed aggregates"""
+    catalog = await get_catalog()
+    return schemas.Facets(**{
+        column: [schemas.FacetCount(value=value, count=count) for value, count in counts]
+        for column, counts in catalog.facets().items()
+    })
+
+async def get_ranked_university_ids(by: str, state: Optional[str] = None, limit: int = 10) -> List[int]:
+    """Top `limit` university ids by a rating column, optionally within one state"""
+    if not 1 <= limit <= MAX_MATCH_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_MATCH_LIMIT}")
+    catalog = await get_catalog()
+    return catalog.ranked_ids(by, state)[:limit].tolist()
+
+async def search_university_ids(query: str, limit: int = 10, autocomplete: bool = False) -> List[int]:
+    """Ids of the universities whose names best match `query`, typo tolerant"""
+    if not 1 <= limit <= MAX_MATCH_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_MATCH_LIMIT}")
+    index = await get_name_index()
+    return [uni_id for uni_id, _ in index.search(query, limit, autocomplete)]
+
+async def load_universities(ids: List[int]) -> List[Optional["schemas.UniversityType"]]:
     """
-    Main resolver logic to find and score university matches based on student preferences.
+    UniversityType objects for `ids` (None for unknown ids). Objects are served from the
+    shared university cache and built once per university; the misses are fetched with a
+    single WHERE id IN (...) query. Also the batch function of the request DataLoader.
     """
-    db: Session = SessionLocal()
-    try:
-        student_tuition_min, student_tuition_max = parse_db_range_string(preferences.tuition_range)
-        student_cost_min, student_cost_max = parse_db_range_string(preferences.cost_of_living_range)
-
-        pref_specialties = set(s.strip() for s in preferences.specialties if s.strip())
-        pref_ownerships = set(o.strip() for o in preferences.ownerships if o.strip()) 
-        pref_states = set(st.strip() for st in preferences.states if st.strip())
-        pref_regions = set(r.strip() for r in preferences.regions if r.strip())
-
-        all_unis = get_all_universities(db)
-
-        potential_matches: List[Dict] = []
-
-        # Primary Filtering & Initial Scoring
-        for uni in all_unis:
-            # --- PRIMARY FILTERING (Mulit-select) ---
-            specialty_match = uni.specialty in pref_specialties
-            ownership_match = uni.ownership in pref_ownerships
-            location_match = (uni.state in pref_states) or (uni.geopolitical_region in pref_regions)
-
-            if specialty_match and ownership_match and location_match:
-                    # --- SECONDARY FILTERING (Tuition) and SCORE CALCULATION ---
-                    tuition_match = ranges_overlap(student_tuition_min, student_tuition_max, uni.tuition_min, uni.tuition_max)
-
-                    if tuition_match:
-                        # Calculate positive score
-                        academic_score = preferences.academic_importance * (uni.academic_rigor or 0)
-                        hostel_score = preferences.hostel_importance * (uni.hostel_quality or 0)
-                        sports_score = preferences.sports_importance * (uni.sports_facilities or 0)
-                        social_life_score = preferences.social_life_importance * (uni.social_life or 0)
-
-                        cost_match = ranges_overlap(student_cost_min, student_cost_max, uni.cost_of_living_min, uni.cost_of_living_max)
-                        cost_bonus = 5 if cost_match else 0
-
-                        total_score = float(academic_score + hostel_score + sports_score + social_life_score + cost_bonus)
-
-                        potential_matches.append({"uni": uni, "score": total_score})
-
-                # Fallback Logic (If no matches found with tuition overlap)
-            if not potential_matches:
-                print("No matches found with tuition overlap, entering fallback")
-                for uni in all_unis:
-                    # Apply the primary filter again
-                    specialty_match = uni.specialty in pref_specialties
-                    ownership_match = uni.ownership in pref_ownerships
-                    location_match = (uni.state in pref_states) or (uni.geopolitical_region in pref_regions)
-
-                    if specialty_match and ownership_match and location_match:
-                        # Calculate tuition difference (lower is better)
-                        tuition_diff = calculate_tuition_difference(student_tuition_min, student_tuition_max, uni.tuition_min, uni.tuition_max)
-                        # Use negative difference for sorting (higher negative = closer)
-                        potential_matches.append({"uni": uni, "score": -tuition_diff})
-
-
-            potential_matches.sort(key=lambda x: x["score"], reverse=True)
-            top_matches_data = potential_matches[:10]
-
-            # Format results into Graphql MatchResult type
-            results: List
-        
-            # Format results into Graphql MatchResult type
-            results: List[MatchResult] = []
-            for match_data in top_matches_data:
-                uni_model = match_data["uni"]
-                score = match_data["score"]
-
-                # Create the UniversityType instance for the result
-                uni_type_instance = UniversityType(
-                id=uni_model.id,
-                name=uni_model.name,
-                geopolitical_region=uni_model.geopolitical_region,
-                state=uni_model.state,
-                specialty=uni_model.specialty,
-                ownership=uni_model.ownership,
-                type=uni_model.type,
-                academic_rigor=uni_model.academic_rigor,
-                sports_facilities=uni_model.sports_facilities,
-                hostel_quality=uni_model.hostel_quality,
-                social_life=uni_model.social_life,
-                # Use the stored string representations for display
-                tuition_display=uni_model.tuition_category_str,
-                cost_of_living_display=uni_model.cost_category_str,
-                source_url_1=uni_model.source_url_1,
-                source_url_2=uni_model.source_url_2
-                )
-
-                results.append(MatchResult(university=uni_type_instance), score=score)
-
-                return results
-    finally:
-        db.close()
\ No newline at end of file
+    found: Dict[int, schemas.UniversityType] = {}
+    missing = []
+    for uni_id in ids:
+        university = university_cache.get(uni_id)
+        if university is None:
+            missing.append(uni_id)
+        else:
+            found[uni_id] = university
+
+    if missing:
+        with stage("fetch"):
+            rows = await run_db(get_universities_by_ids, missing)
+        for uni_model in rows:
+            university = to_university_type(uni_model)
+            university_cache.set(university.id, university)
+            found[university.id] = university
+
+    return [found.get(uni_id) for uni_id in ids]
+
+def to_university_type(uni_model) -> "schemas.UniversityType":
+    """Builds a UniversityType from a University row"""
+    return schemas.UniversityType(**{
+        field: getattr(uni_model, column) for field, column in UNIVERSITY_TYPE_COLUMNS.items()
+    })
+
+def _format_matches(match_set, unis_by_id, ids_only: bool) -> List["schemas.MatchResult"]:
+    """Format results into Graphql MatchResult type, reusing the shared UniversityType objects"""
+    results: List[schemas.MatchResult] = []
+    for uni_id, score in match_set.matches:
+        if ids_only:
+            university = schemas.UniversityType(**{**dict.fromkeys(UNIVERSITY_TYPE_COLUMNS), "id": uni_id})
+        else:
+            university = unis_by_id.get(uni_id)
+            if university is None:
+                # Deleted since the catalog was built
+                continue
+
+        results.append(schemas.MatchResult(university=university, score=score))
+
+    return results
@@ -1,6 +1,10 @@
 import strawberry 
+from enum import Enum
 from typing import List, Optional
-from .resolvers import get_university_matches
+from graphql import GraphQLError
+from strawberry.types import Info
+from .admission import Overloaded
+from .core.config import MAX_LOOKUP_IDS
 
 
 
@@ -32,10 +36,10 @@ class UniversityType:
     type: Optional[str]
     academic_rigor: Optional[int]
     sports_facilities: Optional[int]
-    hostel_quality: Optional[list]
+    hostel_quality: Optional[int]
     social_life: Optional[int]
-    tuition_display: Optional[str] = strawberry.field(alias="tuition_category_str")  # Use alias if needed
-    cost_of_living_display: Optional[str] = strawberry.field(alias="cost_category_str")  # Use alias if needed
+    tuition_display: Optional[str] = strawberry.field(description="Original tuition category string (tuition_category_str)")
+    cost_of_living_display: Optional[str] = strawberry.field(description="Original cost of living category string (cost_category_str)")
     source_url_1: Optional[str]
     source_url_2: Optional[str]
 
@@ -46,23 +50,96 @@ class MatchResult:
     university: UniversityType
     score: float
 
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool
+    end_cursor: Optional[str] = strawberry.field(description="Pass as `after` to fetch the next page")
+
+
+# One page of ranked matches
+@strawberry.type
+class MatchConnection:
+    matches: List[MatchResult]
+    total_count: int = strawberry.field(description="Number of universities matching the preferences across all pages")
+    page_info: PageInfo
+
+@strawberry.type
+class FacetCount:
+    value: str
+    count: int
+
+
+# Filter sidebar counts, most common value first
+@strawberry.type
+class Facets:
+    specialty: List[FacetCount]
+    ownership: List[FacetCount]
+    state: List[FacetCount]
+    geopolitical_region: List[FacetCount]
+
+
+# Rating columns universities can be ranked by
+@strawberry.enum
+class RankBy(Enum):
+    ACADEMIC_RIGOR = "academic_rigor"
+    HOSTEL_QUALITY = "hostel_quality"
+    SPORTS_FACILITIES = "sports_facilities"
+    SOCIAL_LIFE = "social_life"
+
 # Define the main Query type 
 @strawberry.type 
 class Query: 
 
     @strawberry.field
-    async def match_universities(self, preferences: StudentPreferenceInput) -> List[MatchResult]:
-        matches  = await get_university_matches(preferences)
+    async def match_universities(self, info: Info, preferences: StudentPreferenceInput, limit: int = 10,
+                                 after: Optional[str] = None) -> MatchConnection:
+        # Resolvers build these types, so they are imported here rather than at module level
+        from .resolvers import get_university_matches, selected_university_fields
+
+        university_fields = selected_university_fields(info, ("matches", "university"))
+        try:
+            matches  = await get_university_matches(preferences, limit=limit, after=after,
+                                                    university_fields=university_fields)
+        except Overloaded as e:
+            # Shed load with a 503 so clients and load balancers back off and retry
+            response = info.context["response"]
+            response.status_code = 503
+            response.headers["Retry-After"] = "1"
+            raise GraphQLError(str(e), extensions={"code": "OVERLOADED"}) from e
         return matches
+
+    @strawberry.field
+    async def university(self, info: Info, id: int) -> Optional[UniversityType]:
+        return await info.context["university_loader"].load(id)
+
+    @strawberry.field(description="Universities in the order of `ids`; null for unknown ids")
+    async def universities(self, info: Info, ids: List[int]) -> List[Optional[UniversityType]]:
+        if len(ids) > MAX_LOOKUP_IDS:
+            raise ValueError(f"At most {MAX_LOOKUP_IDS} ids can be requested at once")
+        return await info.context["university_loader"].load_many(ids)
     
-    # --- Future Extensibility Example ---
-    # @strawberry.field
-    # async def rank_universities_by_state(self, state: str) -> List[UniversityType]:
-    #     # Implement logic to fetch and return universities ordered by some criteria
-    #     # possibly calling a function in crud.py
-    #     pass
-
-    # @strawberry.field
-    # async def rank_universities_by_academic(self) -> List[UniversityType]:
-    #     # Implement logic...
-    #     pass
\ No newline at end of file
+    @strawberry.field
+    async def facets(self) -> Facets:
+        from .resolvers import get_facets
+
+        return await get_facets()
+
+    @strawberry.field(description="Universities ordered by a rating (highest first), optionally within one state")
+    async def rank_universities(self, info: Info, by: RankBy, state: Optional[str] = None,
+                                limit: int = 10) -> List[UniversityType]:
+        from .resolvers import get_ranked_university_ids
+
+        ids = await get_ranked_university_ids(by.value, state, limit)
+        universities = await info.context["university_loader"].load_many(ids)
+        return [university for university in universities if university is not None]
+
+    @strawberry.field(description="Typo-tolerant name search, best match first. `autocomplete` treats the "
+                                  "last word as an unfinished prefix")
+    async def search_universities(self, info: Info, query: str, limit: int = 10,
+                                  autocomplete: bool = False) -> List[UniversityType]:
+        from .resolvers import search_university_ids
+
+        ids = await search_university_ids(query, limit, autocomplete)
+        universities = await info.context["university_loader"].load_many(ids)
+        return [university for university in universities if university is not None]
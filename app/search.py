@@ -0,0 +1,232 @@
+import asyncio
+import bisect
+import re
+import time
+import weakref
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from sqlalchemy.orm import Session
+
+from .catalog import Catalog, get_catalog, top_k
+from .core.config import CATALOG_RECONCILE_INTERVAL, CATALOG_REFRESH_OVERLAP
+from .crud import get_catalog_watermark, get_university_names
+from .database import run_db, run_db_in_thread
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+# A name must share at least this fraction of the query's trigrams to be returned
+MIN_COVERAGE = 0.3
+# Autocomplete probes prefix matches one by one only while there are at most this many per
+# requested result; beyond that a single bincount over every name is cheaper
+PREFIX_PROBES_PER_RESULT = 50
+
+
+def normalize(text: str) -> str:
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def _word_trigrams(word: str) -> List[str]:
+    # pg_trgm style: the word padded with two leading spaces and one trailing
+    padded = f"  {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def trigrams(text: str) -> Set[str]:
+    grams = set()
+    for word in normalize(text).split():
+        grams.update(_word_trigrams(word))
+    return grams
+
+
+def aliases(words: List[str]) -> List[str]:
+    """Contractions students type for "University of X": "university of lagos" -> "unilagos" (so "Unilag" matches)."""
+    return ["uni" + words[i + 2] for i in range(len(words) - 2) if words[i] == "university" and words[i + 1] == "of"]
+
+
+def _postings(keys: np.ndarray, positions: np.ndarray, n_keys: int) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR postings: (offsets, positions grouped by key)."""
+    offsets = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_keys), out=offsets[1:])
+    return offsets, positions[np.argsort(keys, kind="stable")]
+
+
+class NameIndex:
+    """
+    Trigram postings over university names (plus aliases). A query scores every name
+    sharing a trigram with it in one bincount over the touched postings: coverage of the
+    query's trigrams, plus half the Jaccard similarity to favour tighter matches.
+    """
+
+    def __init__(self, ids: np.ndarray, gram_ids: Dict[str, int], gram_postings: Tuple[np.ndarray, np.ndarray],
+                 gram_counts: np.ndarray, words: List[str], word_postings: Tuple[np.ndarray, np.ndarray],
+                 names: Dict[int, str]):
+        self.ids = ids
+        self.gram_ids = gram_ids
+        # (offsets, positions): the documents of gram g are positions[offsets[g]:offsets[g + 1]]
+        self.gram_postings = gram_postings
+        self.gram_counts = gram_counts  # distinct trigrams per document
+        self.words = words              # sorted distinct words, for prefix lookups
+        self.word_postings = word_postings
+        self.names = names              # id -> indexed name, to tell whether a data change touched names
+        # (max(created_at), row count) of the table the names were read at; set by the loader
+        self.watermark: Optional[Tuple] = None
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls, rows: Sequence) -> "NameIndex":
+        """Builds the index from (id, name) rows."""
+        gram_ids: Dict[str, int] = {}
+        word_ids: Dict[str, int] = {}
+        word_grams: List[List[int]] = []
+        doc_grams: List[int] = []
+        doc_words: List[int] = []
+        gram_counts = np.zeros(len(rows), dtype=np.int32)
+        word_counts = np.zeros(len(rows), dtype=np.int32)
+        for position, row in enumerate(rows):
+            words = normalize(row.name).split()
+            words = {*words, *aliases(words)}
+            grams = set()
+            for word in words:
+                word_id = word_ids.get(word)
+                if word_id is None:
+                    # Names repeat words a lot; trigram each distinct word once
+                    word_id = word_ids[word] = len(word_ids)
+                    word_grams.append([gram_ids.setdefault(gram, len(gram_ids)) for gram in _word_trigrams(word)])
+                grams.update(word_grams[word_id])
+                doc_words.append(word_id)
+            doc_grams.extend(grams)
+            gram_counts[position] = len(grams)
+            word_counts[position] = len(words)
+
+        # Number words in sorted order so a prefix is a contiguous range of word numbers
+        words = sorted(word_ids)
+        rank = np.empty(len(words), dtype=np.int32)
+        rank[[word_ids[word] for word in words]] = np.arange(len(words), dtype=np.int32)
+        positions = np.arange(len(rows), dtype=np.int32)
+        return cls(
+            ids=np.array([row.id for row in rows], dtype=np.int64),
+            gram_ids=gram_ids,
+            gram_postings=_postings(np.array(doc_grams, dtype=np.int32), np.repeat(positions, gram_counts), len(gram_ids)),
+            gram_counts=gram_counts,
+            words=words,
+            word_postings=_postings(rank[np.array(doc_words, dtype=np.int32)], np.repeat(positions, word_counts), len(words)),
+            names={row.id: row.name for row in rows},
+        )
+
+    def _prefix_postings(self, prefix: str) -> np.ndarray:
+        """Documents with a word starting with `prefix`, once per such word (binary search on the sorted words)."""
+        lo = bisect.bisect_left(self.words, prefix)
+        hi = bisect.bisect_left(self.words, prefix + "\uffff")
+        offsets, positions = self.word_postings
+        return positions[offsets[lo]:offsets[hi]]
+
+    def _shared_grams(self, query_grams: List[int], positions: np.ndarray) -> np.ndarray:
+        """Query trigrams shared by each of `positions` (sorted), one binary search per gram and position."""
+        offsets, postings = self.gram_postings
+        shared = np.zeros(positions.size, dtype=np.int64)
+        for g in query_grams:
+            gram_positions = postings[offsets[g]:offsets[g + 1]]
+            found = np.searchsorted(gram_positions, positions)
+            shared += gram_positions[np.minimum(found, gram_positions.size - 1)] == positions
+        return shared
+
+    def _gram_counts(self, query_grams: List[int]) -> np.ndarray:
+        """Query trigrams shared by every document, in one bincount over the touched postings."""
+        if not query_grams:
+            return np.zeros(self.ids.size, dtype=np.int64)
+        offsets, postings = self.gram_postings
+        touched = np.concatenate([postings[offsets[g]:offsets[g + 1]] for g in query_grams])
+        return np.bincount(touched, minlength=self.ids.size)
+
+    def search(self, query: str, limit: int = 10, autocomplete: bool = False) -> List[Tuple[int, float]]:
+        """
+        Best (id, score) matches for `query`, highest score first. With `autocomplete`,
+        the last (possibly unfinished) word must prefix a word of the name, so only
+        those names are scored; if none qualify the full fuzzy search is used.
+        """
+        words = normalize(query).split()
+        if not words:
+            return []
+        query_grams = [self.gram_ids[gram] for gram in trigrams(query) if gram in self.gram_ids]
+
+        prefixed = self._prefix_postings(words[-1]) if autocomplete else np.empty(0, dtype=np.int32)
+        if 0 < prefixed.size <= PREFIX_PROBES_PER_RESULT * limit:
+            # Few prefix matches: probe just those names instead of counting over every name
+            positions = np.unique(prefixed)
+            shared = self._shared_grams(query_grams, positions)
+        else:
+            counts = self._gram_counts(query_grams)
+            if prefixed.size:
+                # Short or common prefixes ("u", "university of") match most names, where probing
+                # each one costs more than counting everything once and keeping the prefix matches
+                is_prefixed = np.zeros(self.ids.size, dtype=bool)
+                is_prefixed[prefixed] = True
+                positions = np.flatnonzero(is_prefixed)
+            else:
+                positions = np.flatnonzero(counts)
+            shared = counts[positions]
+
+        total = len(trigrams(query))
+        coverage = shared / total
+        if not prefixed.size:
+            keep = coverage >= MIN_COVERAGE
+            positions, shared, coverage = positions[keep], shared[keep], coverage[keep]
+        jaccard = shared / (total + self.gram_counts[positions] - shared)
+        scores = coverage + 0.5 * jaccard
+
+        best = top_k(scores, self.ids[positions], limit)
+        return [(int(self.ids[positions[i]]), float(scores[i])) for i in best]
+
+
+# --- Process-wide index, rebuilt when a catalog change touches names ---
+_index: Optional[NameIndex] = None
+_index_source: Optional[weakref.ref] = None
+_index_lock = asyncio.Lock()
+
+
+def _read_names(db: Session) -> Tuple[Tuple, List]:
+    # Read the watermark first: anything written meanwhile is looked at by the next check
+    return get_catalog_watermark(db), get_university_names(db)
+
+
+def _names_unchanged(db: Session, index: NameIndex) -> bool:
+    """
+    Whether every name written since `index` was built is still the indexed one, i.e. the
+    data change only touched other columns; if so the index's watermark is advanced.
+    Like the catalog, the index is rebuilt outright once per reconcile interval, for
+    renames the watermark missed.
+    """
+    if index.watermark is None or index.watermark[0] is None:
+        return False
+    if 0 < CATALOG_RECONCILE_INTERVAL <= time.monotonic() - index.built_at:
+        return False
+    watermark = get_catalog_watermark(db)
+    if watermark[1] != len(index.ids):
+        return False
+    since = index.watermark[0] - timedelta(seconds=CATALOG_REFRESH_OVERLAP)
+    if any(index.names.get(row.id) != row.name for row in get_university_names(db, changed_since=since)):
+        return False
+    index.watermark = watermark
+    return True
+
+
+async def get_name_index() -> NameIndex:
+    """
+    The name index for the current catalog. A new catalog snapshot only triggers a rebuild
+    when a name was added, changed or removed (most updates touch ratings or fees); requests
+    keep using the previous index until the check or the rebuild is done.
+    """
+    global _index, _index_source
+    catalog: Catalog = await get_catalog()
+    if _index is not None and (_index_source() is catalog or _index_lock.locked()):
+        return _index
+    async with _index_lock:
+        if _index is None or _index_source() is not catalog:
+            if _index is None or not await run_db(_names_unchanged, _index):
+                watermark, rows = await run_db_in_thread(_read_names)
+                _index = await asyncio.to_thread(NameIndex.build, rows)
+                _index.watermark = watermark
+            _index_source = weakref.ref(catalog)
+    return _index
@@ -0,0 +1,111 @@
+import fcntl
+import json
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+
+
+def _load_array(path: str) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        # Zero-length arrays can't be memory mapped
+        return np.load(path)
+
+
+class SharedCatalogStore:
+    """
+    Versioned catalog snapshots in a directory shared by the workers on a host (ideally
+    tmpfs such as /dev/shm). A snapshot is a directory of .npy arrays plus meta.json;
+    CURRENT names the live one and is replaced atomically. Workers load the arrays with
+    mmap_mode="r", so the pages are shared through the page cache instead of copied.
+    """
+
+    def __init__(self, directory: str, keep: int = 3):
+        self.directory = directory
+        self.keep = keep
+        self._leader_file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, *parts: str) -> str:
+        return os.path.join(self.directory, *parts)
+
+    @contextmanager
+    def lock(self):
+        """Exclusive lock serializing builds and publishes across processes."""
+        with open(self._path(".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def try_lead(self) -> bool:
+        """
+        True if this process is (or just became) the one that polls the database and
+        publishes new snapshots. Leadership lasts until the process exits.
+        """
+        if self._leader_file is not None:
+            return True
+        f = open(self._path(".leader"), "w")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        self._leader_file = f
+        return True
+
+    def current_name(self) -> Optional[str]:
+        try:
+            with open(self._path(CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def read(self, name: str) -> Tuple[Dict[str, np.ndarray], Dict]:
+        """Memory-maps the arrays of snapshot `name`; returns (arrays, meta)."""
+        with open(self._path(name, META_FILE)) as f:
+            meta = json.load(f)
+        arrays = {key: _load_array(self._path(name, f"{key}.npy")) for key in meta["arrays"]}
+        return arrays, {**meta, "name": name}
+
+    def publish(self, arrays: Dict[str, np.ndarray], meta: Dict) -> str:
+        """
+        Writes a new snapshot and points CURRENT at it. The version is one more than the
+        current snapshot's. Callers hold lock().
+        """
+        current = self.current_name()
+        version = 1
+        if current is not None:
+            with open(self._path(current, META_FILE)) as f:
+                version = json.load(f)["version"] + 1
+
+        name = f"v{version:08d}-{uuid.uuid4().hex[:8]}"
+        staging = self._path(f".{name}.tmp")
+        os.makedirs(staging)
+        for key, array in arrays.items():
+            np.save(os.path.join(staging, f"{key}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(staging, META_FILE), "w") as f:
+            json.dump({**meta, "version": version, "arrays": list(arrays)}, f)
+        os.rename(staging, self._path(name))
+
+        pointer = self._path(f".{CURRENT_FILE}.tmp")
+        with open(pointer, "w") as f:
+            f.write(name)
+        os.replace(pointer, self._path(CURRENT_FILE))
+        self._remove_old_snapshots()
+        return name
+
+    def _remove_old_snapshots(self):
+        # Workers still mapping a removed snapshot keep their pages until they swap
+        snapshots = sorted(entry for entry in os.listdir(self.directory) if entry.startswith("v"))
+        for name in snapshots[:-self.keep]:
+            shutil.rmtree(self._path(name), ignore_errors=True)
@@ -1,6 +1,10 @@
+import base64
+import binascii
 import re
-from typing import Optional, Dict, Tuple
+from functools import lru_cache
+from typing import Optional, Dict, List, Tuple, NamedTuple
 
+@lru_cache(maxsize=4096)  # Range strings are a small set of form options; parse each once
 def parse_db_range_string(range_str: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
     if not range_str:
         return None, None
@@ -24,26 +28,9 @@ def ranges_overlap(student_min: Optional[int], student_max: Optional[int],uni_mi
     Checks if two nullable ranges [min, max] overlap. 
     None represents infinity
     """
-    if student_max is None:
-        return (uni_max is None or (student_min is not None and uni_max >= student_min)) and \
-            (student_min is None or uni_min is None or True)
-
-    if student_min is None:
-        return (uni_min is None or (student_max is not None and uni_min <= student_max)) and \
-            (student_max is None or uni_max is None or True)
-
-    if uni_max is None: 
-        return (uni_min is not None and student_max >= uni_min) and \
-            (uni_min is None or student_min is None or True)
-
-    if uni_min is None:
-        return (uni_max is not None and student_min <=  uni_max ) and \
-            (uni_max is None or student_max is None or True)
-
-    # Handle cases where one range is fully None (shouldn't happen with parse_db_range_string)
-    # Or other edge cases if parsing fails. Consider default behavior (overlap or not?)
-
-    return False
+    lower_ok = student_min is None or uni_max is None or uni_max >= student_min
+    upper_ok = student_max is None or uni_min is None or uni_min <= student_max
+    return lower_ok and upper_ok
 
 def calculate_tuition_difference(student_min: Optional[int], student_max: Optional[int],
 uni_min: Optional[int], uni_max: Optional[int]
@@ -63,4 +50,57 @@ uni_min: Optional[int], uni_max: Optional[int]
         return float(student_min - uni_max) # How far below
 
     # If they overlap or uni is within/below student range
-    return 0 # Treat overlap or being cheaper as zero difference for this fallback metric
\ No newline at end of file
+    return 0 # Treat overlap or being cheaper as zero difference for this fallback metric
+
+
+# Score bonus for a university whose cost of living overlaps the student's range
+COST_MATCH_BONUS = 5
+
+class MatchCriteria(NamedTuple):
+    """Canonical, hashable form of a StudentPreferenceInput used by the matching engine."""
+    specialties: Tuple[str, ...]
+    ownerships: Tuple[str, ...]
+    states: Tuple[str, ...]
+    regions: Tuple[str, ...]
+    tuition_range: Tuple[Optional[int], Optional[int]]
+    cost_range: Tuple[Optional[int], Optional[int]]
+    # (academic, hostel, sports, social_life) importance ratings
+    weights: Tuple[int, int, int, int]
+
+class MatchSet(NamedTuple):
+    """One page of ranked (university_id, score) pairs produced by the matching engines."""
+    matches: List[Tuple[int, float]]
+    fallback: bool
+    total_count: int = 0
+    has_next_page: bool = False
+
+def encode_cursor(score: float, university_id: int) -> str:
+    """Opaque pagination cursor for the (score, id) position of a match."""
+    return base64.urlsafe_b64encode(f"{score!r}:{university_id}".encode("ascii")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        score, university_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii").split(":")
+        return float(score), int(university_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError(f"Invalid cursor: '{cursor}'")
+
+def _clean_choices(values) -> Tuple[str, ...]:
+    return tuple(sorted(set(v.strip() for v in values if v and v.strip())))
+
+def build_match_criteria(preferences) -> MatchCriteria:
+    """Normalizes student preferences: strips and sorts multi-select values and parses ranges once."""
+    return MatchCriteria(
+        specialties=_clean_choices(preferences.specialties),
+        ownerships=_clean_choices(preferences.ownerships),
+        states=_clean_choices(preferences.states),
+        regions=_clean_choices(preferences.regions),
+        tuition_range=parse_db_range_string(preferences.tuition_range),
+        cost_range=parse_db_range_string(preferences.cost_of_living_range),
+        weights=(
+            preferences.academic_importance,
+            preferences.hostel_importance,
+            preferences.sports_importance,
+            preferences.social_life_importance,
+        ),
+    )
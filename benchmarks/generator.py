@@ -0,0 +1,105 @@
+"""
+Seeded synthetic data in the same shapes the app consumes: university rows with the
+CSV headers load_data.py reads, and student preferences shaped like StudentPreferenceInput.
+"""
+import csv
+import random
+from typing import Dict, Iterator, List
+
+STATES_BY_REGION = {
+    "North Central": ["Benue", "FCT", "Kogi", "Kwara", "Nasarawa", "Niger", "Plateau"],
+    "North East": ["Adamawa", "Bauchi", "Borno", "Gombe", "Taraba", "Yobe"],
+    "North West": ["Jigawa", "Kaduna", "Kano", "Katsina", "Kebbi", "Sokoto", "Zamfara"],
+    "South East": ["Abia", "Anambra", "Ebonyi", "Enugu", "Imo"],
+    "South South": ["Akwa Ibom", "Bayelsa", "Cross River", "Delta", "Edo", "Rivers"],
+    "South West": ["Ekiti", "Lagos", "Ogun", "Ondo", "Osun", "Oyo"],
+}
+# Universities cluster in the south west and north central
+REGION_WEIGHTS = {"North Central": 18, "North East": 10, "North West": 14,
+                  "South East": 14, "South South": 16, "South West": 28}
+
+SPECIALTIES = ["Conventional", "Technology", "Agriculture", "Medicine", "Education", "Military", "Open University"]
+SPECIALTY_WEIGHTS = [70, 10, 6, 5, 5, 2, 2]
+
+OWNERSHIPS = ["Federal", "State", "Private"]
+OWNERSHIP_WEIGHTS = [25, 30, 45]
+
+# Private universities charge more; each ownership picks from its own tuition band
+TUITION_CATEGORIES = {
+    "Federal": ["Less than 100,000 naira", "100,000 - 300,000 naira"],
+    "State": ["100,000 - 300,000 naira", "300,000 - 600,000 naira"],
+    "Private": ["300,000 - 600,000 naira", "600,000 - 1,000,000 naira",
+                "1,000,000 - 2,000,000 naira", "Greater than 2,000,000 naira"],
+}
+COST_CATEGORIES = ["Less than 70,000 naira", "70,000 - 100,000 naira",
+                   "100,000 - 200,000 naira", "Greater than 200,000 naira"]
+
+CSV_HEADERS = [
+    "university_name", "geopolitical_region", "state", "specialty", "ownership", "type",
+    "academic_rigor", "sports_facilities", "hostel_quality", "Social Life",
+    "tuition_fees_category", "cost_of_living_category", "source_urls__001", "source_urls__002",
+]
+
+
+def _rating(rnd: random.Random) -> str:
+    # Mostly mid-range ratings with the occasional blank answer
+    if rnd.random() < 0.03:
+        return ""
+    return str(min(5, max(1, round(rnd.gauss(3.2, 1.0)))))
+
+
+def generate_universities(n: int, seed: int = 42) -> Iterator[Dict[str, str]]:
+    """Yields `n` CSV rows (as dicts keyed by CSV_HEADERS) with unique names."""
+    rnd = random.Random(seed)
+    regions = list(REGION_WEIGHTS)
+    region_weights = list(REGION_WEIGHTS.values())
+    for i in range(n):
+        region = rnd.choices(regions, region_weights)[0]
+        state = rnd.choice(STATES_BY_REGION[region])
+        specialty = rnd.choices(SPECIALTIES, SPECIALTY_WEIGHTS)[0]
+        ownership = rnd.choices(OWNERSHIPS, OWNERSHIP_WEIGHTS)[0]
+        yield {
+            "university_name": f"{ownership} University of {specialty}, {state} #{i}",
+            "geopolitical_region": region,
+            "state": state,
+            "specialty": specialty,
+            "ownership": ownership,
+            "type": rnd.choice(["University", "Polytechnic", "College of Education"]),
+            "academic_rigor": _rating(rnd),
+            "sports_facilities": _rating(rnd),
+            "hostel_quality": _rating(rnd),
+            "Social Life": _rating(rnd),
+            "tuition_fees_category": rnd.choice(TUITION_CATEGORIES[ownership]),
+            "cost_of_living_category": rnd.choice(COST_CATEGORIES),
+            "source_urls__001": f"https://example.edu.ng/{i}",
+            "source_urls__002": "",
+        }
+
+
+def write_universities_csv(path: str, n: int, seed: int = 42):
+    with open(path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_HEADERS)
+        writer.writeheader()
+        writer.writerows(generate_universities(n, seed))
+
+
+def generate_preferences(n: int, seed: int = 7) -> List[Dict]:
+    """`n` student preference dicts using StudentPreferenceInput field names."""
+    rnd = random.Random(seed)
+    all_states = [state for states in STATES_BY_REGION.values() for state in states]
+    tuition_options = sorted({c for cats in TUITION_CATEGORIES.values() for c in cats})
+    preferences = []
+    for _ in range(n):
+        preferences.append({
+            "specialties": rnd.sample(SPECIALTIES, rnd.randint(1, 3)),
+            "ownerships": rnd.sample(OWNERSHIPS, rnd.randint(1, 3)),
+            "states": rnd.sample(all_states, rnd.randint(0, 4)),
+            "regions": rnd.sample(list(STATES_BY_REGION), rnd.randint(0, 2)),
+            "academic_importance": rnd.randint(1, 5),
+            "hostel_importance": rnd.randint(1, 5),
+            "social_life_importance": rnd.randint(1, 5),
+            "sports_importance": rnd.randint(1, 5),
+            "tuition_range": rnd.choice(tuition_options),
+            "cost_of_living_range": rnd.choice(COST_CATEGORIES),
+        })
+    return preferences
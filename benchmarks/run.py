@@ -0,0 +1,177 @@
+"""
+Benchmarks the matching hot path against a local SQLite database (no network needed).
+
+    python -m benchmarks.run --sizes 1000 10000 100000 --output bench.json
+
+Each size gets a freshly generated catalog, loaded through load_data.py. Timings are
+reported in milliseconds as JSON so runs can be diffed between commits.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from .generator import generate_preferences, write_universities_csv
+
+GRAPHQL_QUERY = """
+query Match($preferences: StudentPreferenceInput!) {
+  matchUniversities(preferences: $preferences) {
+    totalCount
+    matches { score university { id name state tuitionDisplay } }
+  }
+}
+"""
+
+
+def _timings(samples: List[float]) -> Dict[str, float]:
+    samples_ms = [s * 1000 for s in samples]
+    return {
+        "runs": len(samples_ms),
+        "min_ms": min(samples_ms),
+        "median_ms": statistics.median(samples_ms),
+        "mean_ms": statistics.fmean(samples_ms),
+        "max_ms": max(samples_ms),
+    }
+
+
+def measure(fn: Callable[[int], object], repeat: int) -> Dict[str, float]:
+    """Times fn(i) for i in range(repeat)."""
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+    return _timings(samples)
+
+
+def _camel(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(part.title() for part in rest)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def bench_size(size: int, repeat: int, workdir: str) -> Dict[str, Dict[str, float]]:
+    from fastapi.testclient import TestClient
+
+    import load_data
+    from app.cache import invalidate_match_caches, match_cache
+    from app.database import Base, SessionLocal, engine
+    from app.main import app
+    from app.resolvers import get_university_matches
+    from app.schemas import StudentPreferenceInput
+    from app.utils import parse_db_range_string, ranges_overlap
+
+    results = {}
+    csv_path = os.path.join(workdir, f"universities_{size}.csv")
+    write_universities_csv(csv_path, size)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        stats = load_data.load_data_from_csv(db, csv_path)
+        results["load_data"] = {**_timings([time.perf_counter() - started]), "rows_per_sec": stats["rows_per_sec"]}
+    finally:
+        db.close()
+    invalidate_match_caches()
+
+    preferences = generate_preferences(max(repeat, 1))
+    range_strings = [p["tuition_range"] for p in preferences] + [p["cost_of_living_range"] for p in preferences]
+
+    def parse_ranges(_):
+        parse_db_range_string.cache_clear()
+        for value in range_strings:
+            parse_db_range_string(value)
+
+    results["parse_db_range_string"] = measure(parse_ranges, repeat)
+    parsed = [parse_db_range_string(value) for value in range_strings]
+    pairs = [(a + b) for a in parsed for b in parsed]
+    results["ranges_overlap"] = measure(lambda _: [ranges_overlap(*pair) for pair in pairs], repeat)
+
+    # Measure the engine itself, not the result cache
+    match_cache.enabled = False
+    loop = asyncio.new_event_loop()
+    try:
+        inputs = [StudentPreferenceInput(**p) for p in preferences]
+        started = time.perf_counter()
+        loop.run_until_complete(get_university_matches(inputs[0]))
+        results["get_university_matches_cold"] = _timings([time.perf_counter() - started])
+        results["get_university_matches"] = measure(
+            lambda i: loop.run_until_complete(get_university_matches(inputs[i % len(inputs)])), repeat
+        )
+    finally:
+        loop.close()
+
+    with TestClient(app) as client:
+        bodies = [
+            {"query": GRAPHQL_QUERY, "variables": {"preferences": {_camel(k): v for k, v in p.items()}}}
+            for p in preferences
+        ]
+
+        def post(i):
+            response = client.post("/graphql", json=bodies[i % len(bodies)])
+            assert response.status_code == 200 and "errors" not in response.json(), response.text
+
+        results["graphql_post"] = measure(post, repeat)
+    match_cache.enabled = True
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per benchmark")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    parser.add_argument("--workdir", help="Directory for the SQLite database and generated CSVs")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="myuni-bench-")
+    # Must be set before anything from `app` is imported: the engine is built at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import numpy
+    from app.core.config import MATCH_BACKEND
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "match_backend": MATCH_BACKEND,
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        print(f"Benchmarking {size} universities...", file=sys.stderr)
+        # Keep loader/app progress output off stdout so it stays valid JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            report["results"][str(size)] = bench_size(size, args.repeat, workdir)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+import pytest
+
+# The app reads DATABASE_URL at import time; default to a throwaway SQLite file so the
+# tests run without a database server (test_db.py skips its Postgres-only check then).
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="myuni-test-"), "test.db"))
+
+
+@pytest.fixture(scope="session")
+def make_university_db(tmp_path_factory):
+    """
+    Factory for sessions on fresh SQLite databases loaded with `n` generated universities
+    through load_data.py, independent of DATABASE_URL.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import Base
+    from benchmarks.generator import write_universities_csv
+    from load_data import load_data_from_csv
+
+    sessions = []
+
+    def make(n: int, seed: int = 42):
+        directory = tmp_path_factory.mktemp("universities")
+        engine = create_engine(f"sqlite:///{directory / 'universities.db'}")
+        Base.metadata.create_all(bind=engine)
+        csv_path = str(directory / "universities.csv")
+        write_universities_csv(csv_path, n, seed)
+        db = sessionmaker(bind=engine)()
+        load_data_from_csv(db, csv_path)
+        sessions.append(db)
+        return db
+
+    yield make
+    for db in sessions:
+        db.close()
@@ -1,98 +1,237 @@
 import csv
+import io
 import os
+import time
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import bindparam, func, insert, or_, select, table, column, text, update
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine, Base # Import your SQLAlchemy setup
 from app.models import University                     # Import your University model
-from app.utils import parse_db_range_string           # Import your parsing utility
+from app.utils import parse_db_range_string           # Import your parsing utility (memoized per distinct string)
 from app.core.config import DATABASE_URL              # To verify DB URL is loaded
+from app.cache import invalidate_match_caches         # Cached matches are stale after a load
 
 # --- Configuration ---
 CSV_FILE_PATH = 'Find MyUni 3.0 (Responses) - University Data.csv' # Adjust if needed
+CHUNK_SIZE = int(os.getenv("LOAD_CHUNK_SIZE", "5000"))  # Rows per upsert + commit
+STAGING_TABLE = "universities_staging"
 
-def load_data_from_csv(db: Session, csv_filepath: str):
-    """
-    Reads data from the CSV file, parses it, and loads it into the database.
-    """
-    if not os.path.exists(csv_filepath):
-        print(f"Error: CSV file not found at {csv_filepath}")
-        return
+# Columns written by the loader; `name` is the conflict key
+TEXT_COLUMNS = (
+    "name", "geopolitical_region", "state", "specialty", "ownership", "type",
+    "tuition_category_str", "cost_category_str", "source_url_1", "source_url_2",
+)
+INT_COLUMNS = (
+    "academic_rigor", "sports_facilities", "hostel_quality", "social_life",
+    "tuition_min", "tuition_max", "cost_of_living_min", "cost_of_living_max",
+)
+UPSERT_COLUMNS = TEXT_COLUMNS + INT_COLUMNS
+UPDATE_COLUMNS = tuple(c for c in UPSERT_COLUMNS if c != "name")
+# Dialects with INSERT ... ON CONFLICT; any other database takes the portable path
+ON_CONFLICT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+# Errors caused by the rows themselves (constraint violations, bad values): worth bisecting a chunk for
+ROW_ERRORS = (IntegrityError, DataError)
+
+
+def to_int_or_none(value_str: Optional[str], uni_name: str) -> Optional[int]:
+    """Helper to convert to int or None"""
+    if value_str and value_str.strip():
+        try:
+            return int(value_str)
+        except ValueError:
+            print(f"Warning: Could not convert '{value_str}' to int for uni '{uni_name}'. Using None.")
+            return None
+    return None
+
+
+def parse_university_row(row: Dict[str, str]) -> Dict:
+    """Maps one CSV row onto University column values."""
+    uni_name = row.get('university_name', '').strip()
+    # Parse tuition and cost of living ranges
+    tuition_min, tuition_max = parse_db_range_string(row.get('tuition_fees_category'))
+    cost_min, cost_max = parse_db_range_string(row.get('cost_of_living_category'))
+    return dict(
+        name=uni_name,
+        geopolitical_region=row.get('geopolitical_region', '').strip(),
+        state=row.get('state', '').strip(),
+        specialty=row.get('specialty', '').strip(),
+        ownership=row.get('ownership', '').strip(),
+        type=row.get('type', '').strip(),
+        academic_rigor=to_int_or_none(row.get('academic_rigor'), uni_name),
+        sports_facilities=to_int_or_none(row.get('sports_facilities'), uni_name),
+        hostel_quality=to_int_or_none(row.get('hostel_quality'), uni_name),
+        social_life=to_int_or_none(row.get('Social Life'), uni_name), # Note space in CSV header
+        tuition_min=tuition_min,
+        tuition_max=tuition_max,
+        cost_of_living_min=cost_min,
+        cost_of_living_max=cost_max,
+        tuition_category_str=row.get('tuition_fees_category', '').strip(),
+        cost_category_str=row.get('cost_of_living_category', '').strip(),
+        source_url_1=row.get('source_urls__001', '').strip(),
+        source_url_2=row.get('source_urls__002', '').strip()
+    )
 
-    existing_uni_names = {uni.name for uni in db.query(University.name).all()}
-    new_universities = []
-    skipped_count = 0
 
+def iter_chunks(csv_filepath: str, chunk_size: int, stats: Dict[str, int]) -> Iterator[List[Dict]]:
+    """Streams parsed rows from the CSV in chunks; rows sharing a name within a chunk keep the last one."""
     with open(csv_filepath, mode='r', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile)
         print(f"Reading data from {csv_filepath}...")
-        for i, row in enumerate(reader):
-            try:
-                uni_name = row.get('university_name', '').strip()
-                if not uni_name:
-                    print(f"Skipping row {i+2} due to missing university name.")
-                    skipped_count += 1
+        row_number = 1
+        while True:
+            raw_rows = list(islice(reader, chunk_size))
+            if not raw_rows:
+                return
+            chunk: Dict[str, Dict] = {}
+            for row in raw_rows:
+                row_number += 1
+                try:
+                    values = parse_university_row(row)
+                except Exception as e:
+                    print(f"Error processing row {row_number}: {e}")
+                    stats["skipped"] += 1
                     continue
-
-                if uni_name in existing_uni_names:
-                    # print(f"Skipping already existing university: {uni_name}")
-                    skipped_count += 1
+                if not values["name"]:
+                    print(f"Skipping row {row_number} due to missing university name.")
+                    stats["skipped"] += 1
                     continue
+                chunk[values["name"]] = values
+            if chunk:
+                yield list(chunk.values())
 
-                # Parse tuition and cost of living ranges
-                tuition_min, tuition_max = parse_db_range_string(row.get('tuition_fees_category'))
-                cost_min, cost_max = parse_db_range_string(row.get('cost_of_living_category'))
-
-                # Helper to convert to int or None
-                def to_int_or_none(value_str):
-                    if value_str and value_str.strip():
-                        try:
-                            return int(value_str)
-                        except ValueError:
-                            print(f"Warning: Could not convert '{value_str}' to int for uni '{uni_name}'. Using None.")
-                            return None
-                    return None
-
-                uni_data = University(
-                    name=uni_name,
-                    geopolitical_region=row.get('geopolitical_region', '').strip(),
-                    state=row.get('state', '').strip(),
-                    specialty=row.get('specialty', '').strip(),
-                    ownership=row.get('ownership', '').strip(),
-                    type=row.get('type', '').strip(),
-                    academic_rigor=to_int_or_none(row.get('academic_rigor')),
-                    sports_facilities=to_int_or_none(row.get('sports_facilities')),
-                    hostel_quality=to_int_or_none(row.get('hostel_quality')),
-                    social_life=to_int_or_none(row.get('Social Life')), # Note space in CSV header
-                    tuition_min=tuition_min,
-                    tuition_max=tuition_max,
-                    cost_of_living_min=cost_min,
-                    cost_of_living_max=cost_max,
-                    tuition_category_str=row.get('tuition_fees_category', '').strip(),
-                    cost_category_str=row.get('cost_of_living_category', '').strip(),
-                    source_url_1=row.get('source_urls__001', '').strip(),
-                    source_url_2=row.get('source_urls__002', '').strip()
-                )
-                new_universities.append(uni_data)
-                existing_uni_names.add(uni_name) # Add to set to avoid duplicate additions within the same run
-
-            except Exception as e:
-                print(f"Error processing row {i+2} for university '{uni_name}': {e}")
-                skipped_count += 1
-                continue
-
-    if new_universities:
-        try:
-            db.add_all(new_universities)
-            db.commit()
-            print(f"Successfully added {len(new_universities)} new universities to the database.")
-        except Exception as e:
-            db.rollback()
-            print(f"Error during database commit: {e}")
-            print("Rolling back changes for this batch.")
+
+def _upsert(insert_stmt):
+    """Adds ON CONFLICT (name) DO UPDATE, touching created_at only when a value actually changed."""
+    excluded = insert_stmt.excluded
+    universities = University.__table__
+    changed = or_(*[universities.c[c].is_distinct_from(excluded[c]) for c in UPDATE_COLUMNS])
+    return insert_stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={**{c: excluded[c] for c in UPDATE_COLUMNS}, "created_at": func.now()},
+        where=changed,
+    )
+
+
+def _copy_upsert(db: Session, rows: List[Dict]):
+    """Postgres/psycopg2: COPY the chunk into a temp staging table, then upsert from it."""
+    columns = ", ".join(UPSERT_COLUMNS)
+    db.execute(text(
+        f"CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS "
+        f"SELECT {columns} FROM {University.__tablename__} WITH NO DATA"
+    ))
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([row[c] for c in UPSERT_COLUMNS] for row in rows)
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    # Unquoted empty fields are NULL for the int columns but '' for the text columns
+    cursor.copy_expert(
+        f"COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL ({', '.join(TEXT_COLUMNS)}))",
+        buffer,
+    )
+    staging = table(STAGING_TABLE, *[column(c) for c in UPSERT_COLUMNS])
+    db.execute(_upsert(postgresql.insert(University.__table__).from_select(
+        list(UPSERT_COLUMNS), select(*[staging.c[c] for c in UPSERT_COLUMNS])
+    )))
+
+
+def _portable_upsert(db: Session, rows: List[Dict]):
+    """Any other dialect: look the chunk's names up, update the changed rows by id and insert the new ones."""
+    universities = University.__table__
+    existing = {
+        row.name: row for row in db.execute(
+            select(universities.c.id, *[universities.c[c] for c in UPSERT_COLUMNS])
+            .where(universities.c.name.in_([row["name"] for row in rows]))
+        )
+    }
+    inserts, updates = [], []
+    for row in rows:
+        current = existing.get(row["name"])
+        if current is None:
+            inserts.append(row)
+        elif any(getattr(current, c) != row[c] for c in UPDATE_COLUMNS):
+            updates.append({**{c: row[c] for c in UPDATE_COLUMNS}, "row_id": current.id})
+    if inserts:
+        db.execute(insert(universities), inserts)
+    if updates:
+        # Column keys in the parameters become the SET clause
+        db.execute(
+            update(universities).where(universities.c.id == bindparam("row_id")).values(created_at=func.now()),
+            updates,
+        )
+
+
+def upsert_universities(db: Session, rows: List[Dict]):
+    """Writes one chunk with a single bulk upsert (COPY + staging table on Postgres)."""
+    dialect = db.get_bind().dialect
+    if dialect.name == "postgresql" and dialect.driver == "psycopg2":
+        _copy_upsert(db, rows)
+    elif dialect.name in ON_CONFLICT_INSERTS:
+        db.execute(_upsert(ON_CONFLICT_INSERTS[dialect.name](University.__table__)), rows)
     else:
-        print("No new universities to add.")
+        _portable_upsert(db, rows)
+
 
-    if skipped_count > 0:
-        print(f"Skipped {skipped_count} rows (either due to errors, missing names, or already existing).")
+def write_chunk(db: Session, rows: List[Dict], stats: Dict[str, int]):
+    """
+    Upserts and commits one chunk. If a row is rejected, the chunk is split in half and
+    retried, so a bad row only costs itself instead of rolling back the whole load.
+    Any other database error (lost connection, missing table) would fail every row the
+    same way, so it is raised instead.
+    """
+    try:
+        upsert_universities(db, rows)
+        db.commit()
+        stats["written"] += len(rows)
+    except ROW_ERRORS as e:
+        db.rollback()
+        if len(rows) == 1:
+            print(f"Error writing university '{rows[0]['name']}': {getattr(e, 'orig', e)}")
+            stats["failed"] += 1
+            return
+        middle = len(rows) // 2
+        write_chunk(db, rows[:middle], stats)
+        write_chunk(db, rows[middle:], stats)
+    except Exception:
+        db.rollback()
+        raise
+
+
+def load_data_from_csv(db: Session, csv_filepath: str, chunk_size: int = CHUNK_SIZE) -> Optional[Dict[str, float]]:
+    """
+    Streams the CSV file in chunks and upserts it into the database, committing per chunk.
+    Existing universities (matched by name) are updated in place.
+    Returns load statistics, or None if the file doesn't exist.
+
+    Afterwards the match caches and catalog of *this* process are dropped, which matters when
+    it is called in-process (tests, benchmarks). Running API workers don't see that call: they
+    pick up the new rows through the catalog refresher, whose data version is part of every
+    match cache key (see app/refresh.py).
+    """
+    if not os.path.exists(csv_filepath):
+        print(f"Error: CSV file not found at {csv_filepath}")
+        return None
+
+    stats = {"written": 0, "skipped": 0, "failed": 0}
+    started = time.perf_counter()
+    for chunk_number, rows in enumerate(iter_chunks(csv_filepath, chunk_size, stats), start=1):
+        write_chunk(db, rows, stats)
+        elapsed = time.perf_counter() - started
+        print(f"Chunk {chunk_number}: {stats['written']} rows written ({stats['written'] / elapsed:,.0f} rows/sec)")
+
+    elapsed = time.perf_counter() - started
+    if stats["written"]:
+        invalidate_match_caches()
+        print(f"Successfully upserted {stats['written']} universities in {elapsed:.2f}s "
+              f"({stats['written'] / elapsed:,.0f} rows/sec).")
+    else:
+        print("No universities to add.")
+
+    if stats["skipped"] or stats["failed"]:
+        print(f"Skipped {stats['skipped']} rows (errors or missing names), {stats['failed']} rows failed to write.")
+    return {**stats, "seconds": elapsed, "rows_per_sec": stats["written"] / elapsed if elapsed else 0.0}
 
 
 if __name__ == "__main__":
@@ -115,7 +254,10 @@ if __name__ == "__main__":
     db_session = SessionLocal()
     try:
         load_data_from_csv(db_session, CSV_FILE_PATH)
+    except SQLAlchemyError as e:
+        print(f"Load aborted: {getattr(e, 'orig', e)}")
+        exit(1)
     finally:
         db_session.close()
         print("Database session closed.")
-    print("Data loading process finished.")
\ No newline at end of file
+    print("Data loading process finished.")
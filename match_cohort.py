@@ -0,0 +1,254 @@
+"""
+Offline bulk matching for a whole cohort of form responses (CSV or JSONL), e.g. for counsellor reports.
+
+    python match_cohort.py responses.csv matches.jsonl --workers 8 --limit 10
+
+Each response carries the StudentPreferenceInput fields (snake_case or camelCase names;
+in CSV exports multi-select answers are comma separated). The catalog is loaded once,
+published as a memory-mapped snapshot and attached by every worker process, so workers
+share it instead of each holding a copy. Responses are streamed in chunks with a bounded
+number in flight, and results are appended in input order with a checkpoint after each
+chunk: rerunning the same command resumes where it stopped.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.catalog import attach_shared_catalog, load_catalog, publish_catalog
+from app.core.config import DATABASE_URL
+from app.crud import get_university_names
+from app.database import SessionLocal
+from app.schemas import StudentPreferenceInput
+from app.shared_catalog import SharedCatalogStore
+from app.utils import build_match_criteria
+
+LIST_FIELDS = ("specialties", "ownerships", "states", "regions")
+INT_FIELDS = ("academic_importance", "hostel_importance", "social_life_importance", "sports_importance")
+TEXT_FIELDS = ("tuition_range", "cost_of_living_range")
+CSV_COLUMNS = ["response_id", "rank", "university_id", "university_name", "score", "fallback", "error"]
+
+_CAMEL = re.compile(r"(?<!^)(?=[A-Z])")
+
+
+def read_responses(path: str) -> Iterator[Dict]:
+    """Streams raw responses from a CSV or JSONL file, one dict at a time."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def parse_preferences(raw: Dict) -> StudentPreferenceInput:
+    """Maps one raw response onto StudentPreferenceInput; raises on missing or malformed fields."""
+    fields = {_CAMEL.sub("_", key.strip()).lower(): value for key, value in raw.items()}
+    values = {}
+    for name in LIST_FIELDS:
+        value = fields.get(name) or []
+        values[name] = value.split(",") if isinstance(value, str) else list(value)
+    for name in INT_FIELDS:
+        values[name] = int(fields[name])
+    for name in TEXT_FIELDS:
+        values[name] = str(fields[name])
+    return StudentPreferenceInput(**values)
+
+
+# --- Worker process state ---
+_worker_catalog = None
+
+
+def _init_worker(snapshot_dir: str):
+    global _worker_catalog
+    _worker_catalog = attach_shared_catalog(store=SharedCatalogStore(snapshot_dir))
+
+
+def match_chunk(records: List[Tuple[str, Dict]], limit: int) -> List[Dict]:
+    """Scores a chunk of (response_id, raw response) pairs with the same logic as matchUniversities."""
+    results = []
+    for response_id, raw in records:
+        try:
+            match_set = _worker_catalog.match(build_match_criteria(parse_preferences(raw)), limit=limit)
+        except Exception as e:
+            results.append({"response_id": response_id, "error": f"{type(e).__name__}: {e}"})
+            continue
+        results.append({
+            "response_id": response_id,
+            "fallback": match_set.fallback,
+            "total_count": match_set.total_count,
+            "matches": match_set.matches,
+        })
+    return results
+
+
+# --- Output and checkpoints ---
+class ResultWriter:
+    """Appends results as JSONL or CSV (one row per match) and records how far it got."""
+
+    def __init__(self, path: str, fmt: str, names: Dict[int, str], resume_offset: int):
+        self.fmt = fmt
+        self.names = names
+        exists = os.path.exists(path)
+        self.file = open(path, "r+" if exists else "w", encoding="utf-8", newline="")
+        # Drop anything written after the last checkpoint
+        self.file.seek(resume_offset)
+        self.file.truncate()
+        self.csv = csv.writer(self.file) if fmt == "csv" else None
+        if self.csv and resume_offset == 0:
+            self.csv.writerow(CSV_COLUMNS)
+
+    def write(self, result: Dict):
+        if "error" in result:
+            if self.csv:
+                self.csv.writerow([result["response_id"], "", "", "", "", "", result["error"]])
+            else:
+                self.file.write(json.dumps(result) + "\n")
+            return
+        matches = [{"id": uni_id, "name": self.names.get(uni_id), "score": score}
+                   for uni_id, score in result["matches"]]
+        if self.csv:
+            if not matches:
+                # Still one row, so every response shows up in the report
+                self.csv.writerow([result["response_id"], "", "", "", "", result["fallback"], ""])
+            for rank, match in enumerate(matches, start=1):
+                self.csv.writerow([result["response_id"], rank, match["id"], match["name"], match["score"],
+                                   result["fallback"], ""])
+        else:
+            self.file.write(json.dumps({**result, "matches": matches}) + "\n")
+
+    def flush(self) -> int:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def read_checkpoint(path: str, input_path: str, output_path: str) -> Tuple[int, int]:
+    """
+    (responses done, output bytes) from a previous run over the same input whose output
+    is still all there, else (0, 0).
+    """
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return 0, 0
+    if checkpoint.get("input") != os.path.abspath(input_path):
+        print(f"Checkpoint {path} is for {checkpoint.get('input')}; starting over.")
+        return 0, 0
+    # Seeking past the end of a missing or truncated output would pad it with NULs
+    output_bytes = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    if output_bytes < checkpoint["output_bytes"]:
+        print(f"{output_path} is missing results recorded in {path}; starting over.")
+        return 0, 0
+    return checkpoint["done"], checkpoint["output_bytes"]
+
+
+def write_checkpoint(path: str, input_path: str, done: int, output_bytes: int):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"input": os.path.abspath(input_path), "done": done, "output_bytes": output_bytes}, f)
+    os.replace(tmp_path, path)
+
+
+def _chunks(responses: Iterator[Dict], id_field: Optional[str], start: int,
+            chunk_size: int) -> Iterator[List[Tuple[str, Dict]]]:
+    numbered = ((str(raw.get(id_field, number)) if id_field else str(number), raw)
+                for number, raw in enumerate(responses, start=1))
+    numbered = islice(numbered, start, None)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(input_path: str, output_path: str, fmt: str, limit: int, workers: int, chunk_size: int,
+        id_field: Optional[str], checkpoint_path: str) -> Dict[str, float]:
+    done, output_bytes = read_checkpoint(checkpoint_path, input_path, output_path)
+    if done:
+        print(f"Resuming after {done} responses.")
+
+    db = SessionLocal()
+    try:
+        catalog = load_catalog(db)
+        names = dict(get_university_names(db))
+    finally:
+        db.close()
+    print(f"Catalog loaded: {len(catalog)} universities.")
+
+    # Published once; workers memory-map it instead of receiving a pickled copy each
+    snapshot_dir = tempfile.mkdtemp(prefix="myuni-cohort-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    writer = ResultWriter(output_path, fmt, names, output_bytes)
+    started = time.perf_counter()
+    processed = 0
+    try:
+        publish_catalog(catalog, store=SharedCatalogStore(snapshot_dir))
+        del catalog
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(snapshot_dir,)) as pool:
+            pending = deque()
+
+            def drain_one():
+                nonlocal done, processed
+                chunk_length, future = pending.popleft()
+                for result in future.result():
+                    writer.write(result)
+                done += chunk_length
+                processed += chunk_length
+                write_checkpoint(checkpoint_path, input_path, done, writer.flush())
+
+            # Bounded in-flight chunks keep memory flat however large the input is
+            for chunk in _chunks(read_responses(input_path), id_field, done, chunk_size):
+                pending.append((len(chunk), pool.submit(match_chunk, chunk, limit)))
+                if len(pending) >= workers * 2:
+                    drain_one()
+                    elapsed = time.perf_counter() - started
+                    print(f"{done} responses matched ({processed / elapsed:,.0f}/sec)")
+            while pending:
+                drain_one()
+    finally:
+        writer.close()
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - started
+    print(f"Matched {processed} responses in {elapsed:.2f}s; results in {output_path}.")
+    return {"processed": processed, "seconds": elapsed, "responses_per_sec": processed / elapsed if elapsed else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Responses as .csv or .jsonl")
+    parser.add_argument("output", help="Results file (.jsonl or .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Defaults to the output file extension")
+    parser.add_argument("--limit", type=int, default=10, help="Matches per response")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=500, help="Responses per worker task")
+    parser.add_argument("--id-field", help="Response field identifying the student (default: row number)")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args(argv)
+
+    if not DATABASE_URL:
+        print("Error: DATABASE_URL environment variable is not set.")
+        exit(1)
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "jsonl")
+    run(args.input, args.output, fmt, args.limit, args.workers, args.chunk_size, args.id_field, checkpoint_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app import resolvers
+from app.admission import AdmissionController, Overloaded, SingleFlight
+from app.cache import LRUCache, MatchCache
+from app.schemas import StudentPreferenceInput
+from app.utils import MatchSet, build_match_criteria
+
+MATCH_QUERY = """
+query Match($preferences: StudentPreferenceInput!, $limit: Int!) {
+  matchUniversities(preferences: $preferences, limit: $limit) { totalCount }
+}
+"""
+PREFERENCES = {
+    "specialties": ["Conventional"], "ownerships": ["Federal"], "states": ["Lagos"], "regions": [],
+    "academicImportance": 5, "hostelImportance": 3, "socialLifeImportance": 2, "sportsImportance": 1,
+    "tuitionRange": "100,000 - 300,000 naira", "costOfLivingRange": "70,000 - 100,000 naira",
+}
+
+
+def rejections(reason: str) -> float:
+    return REGISTRY.get_sample_value("match_admission_rejected_total", {"reason": reason}) or 0.0
+
+
+async def hold(controller: AdmissionController, release: asyncio.Event, timeout: float = 5):
+    async with controller.slot(timeout):
+        await release.wait()
+
+
+def test_admission_rejects_when_the_queue_is_full():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        release = asyncio.Event()
+        running = asyncio.ensure_future(hold(controller, release))
+        queued = asyncio.ensure_future(hold(controller, release))
+        await asyncio.sleep(0.01)
+        assert (controller.active, controller.waiting) == (1, 1)
+
+        before = rejections("queue_full")
+        with pytest.raises(Overloaded):
+            async with controller.slot(5):
+                pass
+        assert rejections("queue_full") == before + 1
+
+        release.set()
+        await asyncio.gather(running, queued)
+        assert (controller.active, controller.waiting) == (0, 0)
+        # Capacity is back once the slots are released
+        async with controller.slot(5):
+            assert controller.active == 1
+
+    asyncio.run(scenario())
+
+
+def test_admission_deadline_expires_while_queued():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=5)
+        release = asyncio.Event()
+        running = asyncio.ensure_future(hold(controller, release))
+        await asyncio.sleep(0.01)
+
+        before = rejections("deadline")
+        with pytest.raises(Overloaded):
+            async with controller.slot(0.05):
+                pass
+        assert rejections("deadline") == before + 1
+        assert (controller.active, controller.waiting) == (1, 0)
+
+        release.set()
+        await running
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_admission_releases_the_slot_on_errors():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=0)
+        with pytest.raises(ValueError):
+            async with controller.slot(1):
+                raise ValueError("boom")
+        assert controller.active == 0
+        async with controller.slot(0.05):
+            pass
+
+    asyncio.run(scenario())
+
+
+def test_single_flight_coalesces_identical_calls():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+        release = asyncio.Event()
+
+        async def compute(value):
+            calls.append(value)
+            await release.wait()
+            return value
+
+        same = [asyncio.ensure_future(flight.do("a", lambda: compute("a"), 5)) for _ in range(5)]
+        other = asyncio.ensure_future(flight.do("b", lambda: compute("b"), 5))
+        await asyncio.sleep(0.01)
+        release.set()
+
+        assert await asyncio.gather(*same) == ["a"] * 5
+        assert await other == "b"
+        assert sorted(calls) == ["a", "b"]
+        await asyncio.sleep(0)
+        # Finished calls are forgotten: the next one computes again
+        assert await flight.do("a", lambda: compute("a"), 5) == "a"
+        assert calls.count("a") == 2
+
+    asyncio.run(scenario())
+
+
+def test_single_flight_shares_errors():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*[flight.do("a", fail, 5) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_single_flight_cancels_only_after_the_last_waiter_leaves():
+    async def scenario():
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+        release = asyncio.Event()
+
+        async def compute():
+            try:
+                await release.wait()
+                return "done"
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        # One caller gives up, the other is still waiting: the computation keeps running
+        impatient = asyncio.ensure_future(flight.do("a", compute, 0.02))
+        patient = asyncio.ensure_future(flight.do("a", compute, 5))
+        with pytest.raises(Overloaded):
+            await impatient
+        assert not cancelled.is_set()
+        release.set()
+        assert await patient == "done"
+
+        # Every caller gives up: the abandoned computation is cancelled
+        release.clear()
+        waiters = [flight.do("b", compute, 0.02) for _ in range(2)]
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        assert all(isinstance(result, Overloaded) for result in results)
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+    asyncio.run(scenario())
+
+
+def test_cached_matches_skip_admission(monkeypatch):
+    preferences = StudentPreferenceInput(
+        specialties=["Conventional"], ownerships=["Federal"], states=["Lagos"], regions=[],
+        academic_importance=5, hostel_importance=3, social_life_importance=2, sports_importance=1,
+        tuition_range="100,000 - 300,000 naira", cost_of_living_range="70,000 - 100,000 naira",
+    )
+    cache = MatchCache(LRUCache())
+    monkeypatch.setattr(resolvers, "match_cache", cache)
+    # No capacity at all: anything that reaches admission control is rejected
+    monkeypatch.setattr(resolvers, "match_admission", AdmissionController(max_concurrency=0, max_queue=0))
+    monkeypatch.setattr(resolvers, "match_flight", SingleFlight())
+    monkeypatch.setattr(resolvers.catalog_refresher, "version", 0)
+
+    async def scenario():
+        with pytest.raises(Overloaded):
+            await resolvers.get_university_matches(preferences, limit=2, university_fields={"id"})
+
+        cache.set(build_match_criteria(preferences), 2, None,
+                  MatchSet(matches=[(7, 20.0), (3, 18.0)], fallback=False, total_count=5, has_next_page=True))
+        connection = await resolvers.get_university_matches(preferences, limit=2, university_fields={"id"})
+        assert [(match.university.id, match.score) for match in connection.matches] == [(7, 20.0), (3, 18.0)]
+        assert connection.total_count == 5
+        assert connection.page_info.has_next_page
+
+    asyncio.run(scenario())
+
+
+def test_shed_requests_are_not_logged_as_errors(monkeypatch, caplog):
+    from app.main import app
+
+    monkeypatch.setattr(resolvers, "match_cache", MatchCache(LRUCache()))
+    monkeypatch.setattr(resolvers, "match_admission", AdmissionController(max_concurrency=0, max_queue=0))
+    monkeypatch.setattr(resolvers, "match_flight", SingleFlight())
+    client = TestClient(app)
+
+    response = client.post("/graphql", json={"query": MATCH_QUERY,
+                                             "variables": {"preferences": PREFERENCES, "limit": 2}})
+    assert response.status_code == 503
+    assert response.json()["errors"][0]["extensions"]["code"] == "OVERLOADED"
+    assert not [record for record in caplog.records if record.name.startswith("strawberry")]
+
+    # Anything else is still logged
+    response = client.post("/graphql", json={"query": MATCH_QUERY,
+                                             "variables": {"preferences": PREFERENCES, "limit": 0}})
+    assert "limit must be between" in response.json()["errors"][0]["message"]
+    assert [record for record in caplog.records if record.name.startswith("strawberry")]
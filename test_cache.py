@@ -0,0 +1,161 @@
+import pytest
+
+from app import cache as cache_module
+from app.cache import (
+    CacheBackend, LRUCache, MatchCache, invalidate_match_caches, make_match_cache_key, match_cache,
+    set_match_cache_backend, university_cache,
+)
+from app.schemas import StudentPreferenceInput
+from app.utils import MatchSet, build_match_criteria
+
+
+class DictBackend(CacheBackend):
+    """Plain dict standing in for an out-of-process store such as Redis."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = tuple(value)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def clear(self):
+        self.data.clear()
+
+
+def preferences(**overrides) -> StudentPreferenceInput:
+    values = dict(
+        specialties=["Engineering", "Medicine"],
+        ownerships=["Federal", "State"],
+        states=["Lagos", "Oyo"],
+        regions=["South West"],
+        academic_importance=5,
+        hostel_importance=3,
+        social_life_importance=2,
+        sports_importance=1,
+        tuition_range="100,000 - 300,000 naira",
+        cost_of_living_range="70,000 - 100,000 naira",
+    )
+    values.update(overrides)
+    return StudentPreferenceInput(**values)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", fake)
+    return fake
+
+
+def test_cache_backend_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+
+def test_match_cache_key_ignores_answer_order_and_whitespace():
+    reordered = preferences(
+        specialties=[" Medicine", "Engineering ", "Medicine"],
+        ownerships=["State", "Federal", ""],
+        states=["Oyo ", " Lagos"],
+    )
+    assert build_match_criteria(reordered) == build_match_criteria(preferences())
+    assert (make_match_cache_key(build_match_criteria(reordered), 10)
+            == make_match_cache_key(build_match_criteria(preferences()), 10))
+
+
+def test_match_cache_key_covers_page_and_version():
+    criteria = build_match_criteria(preferences())
+    keys = {
+        make_match_cache_key(criteria, 10),
+        make_match_cache_key(criteria, 20),
+        make_match_cache_key(criteria, 10, after=(4.5, 7)),
+        make_match_cache_key(criteria, 10, version=1),
+        make_match_cache_key(build_match_criteria(preferences(states=["Lagos"])), 10),
+    }
+    assert len(keys) == 5
+
+
+def test_match_cache_round_trips_through_backend():
+    cache = MatchCache(DictBackend())
+    criteria = build_match_criteria(preferences())
+    match_set = MatchSet(matches=[(3, 9.5), (1, 7.0)], fallback=False, total_count=2)
+
+    assert cache.get(criteria, 10) is None
+    cache.set(criteria, 10, None, match_set)
+    reordered = build_match_criteria(preferences(states=[" Oyo", "Lagos"]))
+    assert cache.get(reordered, 10) == match_set
+    assert cache.get(criteria, 10, version=1) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_match_cache_disabled_stores_nothing():
+    backend = DictBackend()
+    cache = MatchCache(backend, enabled=False)
+    criteria = build_match_criteria(preferences())
+    cache.set(criteria, 10, None, MatchSet(matches=[], fallback=False))
+    assert backend.data == {}
+    assert cache.get(criteria, 10) is None
+
+
+def test_lru_cache_ttl_expiry(clock):
+    cache = LRUCache(maxsize=10, ttl=30)
+    cache.set("a", 1)
+    clock.now += 29
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.evictions == 1
+    assert len(cache) == 0
+
+
+def test_lru_cache_without_ttl_never_expires(clock):
+    cache = LRUCache(maxsize=10)
+    cache.set("a", 1)
+    clock.now += 10 ** 6
+    assert cache.get("a") == 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    cache.set("d", 4)
+    cache.set("e", 5)
+    assert cache.evictions == 3
+    assert len(cache) == 2
+
+
+def test_invalidate_match_caches(monkeypatch):
+    from app import catalog
+
+    backend = DictBackend()
+    monkeypatch.setattr(match_cache, "backend", match_cache.backend)
+    set_match_cache_backend(backend)
+    criteria = build_match_criteria(preferences())
+    match_cache.set(criteria, 10, None, MatchSet(matches=[(1, 1.0)], fallback=False))
+    university_cache.set(1, object())
+    monkeypatch.setattr(catalog, "_catalog", object())
+
+    invalidate_match_caches()
+
+    assert backend.data == {}
+    assert university_cache.get(1) is None
+    assert catalog._catalog is None
@@ -0,0 +1,183 @@
+import asyncio
+import random
+from datetime import timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from sqlalchemy import func, update
+
+from app import catalog as catalog_module, refresh
+from app.catalog import CATEGORICAL_COLUMNS, RATING_COLUMNS, Catalog, apply_catalog_changes, load_catalog
+from app.crud import get_catalog_rows, get_catalog_watermark
+from app.index import BitsetIndex
+from app.models import University
+from app.refresh import CatalogRefresher
+from app.utils import MatchCriteria
+
+
+def decoded(catalog: Catalog):
+    """id -> every column with categorical codes turned back into values, independent of row order and codes."""
+    values = {column: list(vocab) for column, vocab in catalog.vocabularies.items()}
+    rows = {}
+    for pos, uni_id in enumerate(catalog.ids.tolist()):
+        rows[uni_id] = (
+            tuple(catalog.ratings[pos].tolist()),
+            catalog.tuition_min[pos], catalog.tuition_max[pos], catalog.cost_min[pos], catalog.cost_max[pos],
+            tuple(values[column][catalog.codes[column][pos]] for column in CATEGORICAL_COLUMNS),
+        )
+    return rows
+
+
+def random_criteria(rnd: random.Random, catalog: Catalog) -> MatchCriteria:
+    def pick(column, most):
+        return tuple(sorted(rnd.sample(list(catalog.vocabularies[column]), rnd.randint(0, most))))
+
+    ranges = [(None, None), (100000, 300000), (None, 100000), (2000000, None), (700000, 900000)]
+    return MatchCriteria(
+        specialties=pick("specialty", 3), ownerships=pick("ownership", 2),
+        states=pick("state", 3), regions=pick("geopolitical_region", 1),
+        tuition_range=rnd.choice(ranges), cost_range=rnd.choice(ranges),
+        weights=tuple(rnd.randint(1, 5) for _ in range(4)),
+    )
+
+
+def assert_same_catalog(incremental: Catalog, rebuilt: Catalog):
+    assert len(incremental) == len(rebuilt)
+    assert decoded(incremental) == decoded(rebuilt)
+
+    # The patched bitsets must be exactly what a fresh build over the same codes produces
+    fresh = BitsetIndex.build(incremental.codes, incremental.vocab_sizes())
+    assert incremental.index.size == len(incremental)
+    for column in CATEGORICAL_COLUMNS:
+        np.testing.assert_array_equal(incremental.index.bitsets[column], fresh.bitsets[column])
+        np.testing.assert_array_equal(
+            incremental.value_counts()[column],
+            np.bincount(incremental.codes[column], minlength=len(incremental.vocabularies[column])),
+        )
+    assert incremental.facets() == rebuilt.facets()
+
+    for column in RATING_COLUMNS:
+        for state in [None, *rebuilt.vocabularies["state"]]:
+            np.testing.assert_array_equal(incremental.ranked_ids(column, state), rebuilt.ranked_ids(column, state))
+
+    rnd = random.Random(11)
+    for _ in range(300):
+        criteria = random_criteria(rnd, rebuilt)
+        assert incremental.match(criteria, limit=25) == rebuilt.match(criteria, limit=25), criteria
+
+
+def as_rows(db):
+    return [SimpleNamespace(**row._asdict()) for row in get_catalog_rows(db)]
+
+
+def edit(row, **changes):
+    return SimpleNamespace(**{**vars(row), **changes})
+
+
+@pytest.fixture(scope="module")
+def catalog_rows(make_university_db):
+    db = make_university_db(400, seed=3)
+    return as_rows(db)
+
+
+@pytest.mark.parametrize("counts_built", [False, True])
+def test_with_rows_matches_a_rebuild(catalog_rows, counts_built):
+    base_rows = catalog_rows[:300]
+    base = Catalog.from_rows(base_rows)
+    before = decoded(base)
+    if counts_built:
+        # Exercise the value_counts patch as well as the lazy recount
+        base.facets()
+
+    rnd = random.Random(5)
+    changes = [
+        # Moved codes: existing values swapped between rows
+        edit(base_rows[0], state=base_rows[1].state, specialty=base_rows[2].specialty),
+        edit(base_rows[1], ownership=base_rows[0].ownership, academic_rigor=None),
+        # New vocabulary values, on an update and on an insert
+        edit(base_rows[2], state="Atlantis", geopolitical_region="Offshore"),
+        edit(catalog_rows[300], specialty="Law", ownership="Community"),
+        # The same id twice: the last version wins
+        edit(base_rows[3], hostel_quality=1),
+        edit(base_rows[3], hostel_quality=5, tuition_min=None, tuition_max=None),
+    ]
+    changes += [edit(row, state=rnd.choice(base_rows).state, social_life=rnd.randint(1, 5))
+                for row in rnd.sample(base_rows[4:], 40)]
+    changes += catalog_rows[301:]
+    final = {row.id: row for row in base_rows}
+    final.update((row.id, row) for row in changes)
+    # Every row of one value moved away, so its count drops to zero
+    moved = [edit(row, specialty="Conventional") for row in final.values() if row.specialty == "Military"]
+    assert moved
+    changes += moved
+    final.update((row.id, row) for row in moved)
+    incremental = base.with_rows(changes)
+
+    assert_same_catalog(incremental, Catalog.from_rows(list(final.values())))
+    assert dict(incremental.facets()["specialty"]).get("Military") is None
+    # Copy-on-write: the original snapshot is untouched
+    assert decoded(base) == before
+    assert_same_catalog(base, Catalog.from_rows(base_rows))
+
+
+def test_apply_catalog_changes_matches_a_rebuild(make_university_db):
+    db = make_university_db(300, seed=9)
+    catalog = load_catalog(db)
+    catalog.value_counts()
+
+    universities = db.query(University).order_by(University.id).all()
+    universities[0].state = "Atlantis"
+    universities[0].geopolitical_region = "Offshore"
+    universities[1].specialty = universities[2].specialty
+    universities[1].academic_rigor = None
+    universities[5].tuition_min, universities[5].tuition_max = None, 50000
+    db.add(University(name="New University", geopolitical_region="South West", state="Lagos",
+                      specialty="Law", ownership="Private", academic_rigor=4, tuition_min=300000, tuition_max=600000))
+    db.commit()
+
+    updated, changed_ids = apply_catalog_changes(db, catalog, get_catalog_watermark(db))
+
+    assert changed_ids is not None
+    assert {universities[0].id, universities[1].id, universities[5].id} <= set(changed_ids)
+    assert updated is not catalog
+    assert updated.watermark == get_catalog_watermark(db)
+    assert_same_catalog(updated, load_catalog(db))
+
+    # Deletes can't be applied incrementally: the row count mismatch forces a rebuild
+    db.delete(universities[3])
+    db.commit()
+    rebuilt, changed_ids = apply_catalog_changes(db, updated, get_catalog_watermark(db))
+    assert changed_ids is None
+    assert universities[3].id not in decoded(rebuilt)
+    assert_same_catalog(rebuilt, load_catalog(db))
+
+
+def test_refresher_reconciles_writes_below_the_watermark(make_university_db, monkeypatch):
+    db = make_university_db(100, seed=12)
+
+    async def on_db(fn, *args, **kwargs):
+        return fn(db, *args, **kwargs)
+
+    monkeypatch.setattr(refresh, "run_db", on_db)
+    monkeypatch.setattr(refresh, "run_db_in_thread", on_db)
+    monkeypatch.setattr(catalog_module, "_catalog", load_catalog(db))
+    refresher = CatalogRefresher(interval=1, reconcile_interval=60)
+    asyncio.run(refresher.refresh())
+    version = refresher.version
+
+    # A long transaction commits a change stamped before the watermark, with the row count unchanged
+    oldest = db.query(func.min(University.created_at)).scalar()
+    university = db.query(University).order_by(University.id).first()
+    db.execute(update(University).where(University.id == university.id)
+               .values(state="Atlantis", created_at=oldest - timedelta(hours=1)))
+    db.commit()
+    assert not asyncio.run(refresher.refresh())
+    assert decoded(catalog_module.current_catalog()) != decoded(load_catalog(db))
+
+    refresher.reconciled_at -= 60
+    assert asyncio.run(refresher.refresh())
+    assert refresher.version == version + 1
+    assert decoded(catalog_module.current_catalog()) == decoded(load_catalog(db))
+    assert not refresher._reconcile_due()
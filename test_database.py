@@ -0,0 +1,13 @@
+import asyncio
+import threading
+
+from app.database import run_db_in_thread
+
+
+def test_run_db_in_thread_runs_off_the_event_loop():
+    async def scenario():
+        loop_thread = threading.get_ident()
+        worker_thread = await run_db_in_thread(lambda db: threading.get_ident())
+        assert worker_thread != loop_thread
+
+    asyncio.run(scenario())
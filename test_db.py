@@ -1,6 +1,11 @@
-from sqlalchemy import create_engine
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import make_url
 from app.core.config import DATABASE_URL
 
+MATCH_QUERY_INDEXES = ("ix_university_specialty_state", "ix_university_location")
+
 def test_connection():
     try:
         engine = create_engine(DATABASE_URL)
@@ -9,5 +14,41 @@ def test_connection():
     except Exception as e:
         print(f"Connection failed: {e}")
 
+def test_match_query_uses_indexes():
+    """
+    EXPLAINs the SQL matching query against Postgres and checks that the composite
+    indexes are used. Sequential scans are disabled for the check so a small table
+    doesn't hide whether the indexes are usable.
+    """
+    if not DATABASE_URL or make_url(DATABASE_URL).get_backend_name() != "postgresql":
+        pytest.skip("EXPLAIN check needs DATABASE_URL to point at Postgres")
+    from app import models  # noqa: F401  (registers the tables on Base.metadata)
+    from app.crud import build_match_query
+    from app.database import Base, engine
+    from app.utils import MatchCriteria
+
+    criteria = MatchCriteria(
+        specialties=("Engineering", "Medicine"),
+        ownerships=("Federal", "State"),
+        states=("Lagos", "Oyo"),
+        regions=("South West",),
+        tuition_range=(100000, 300000),
+        cost_range=(70000, 100000),
+        weights=(5, 3, 2, 1),
+    )
+    sql = build_match_query(criteria, limit=10).compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    # The indexes are declared on the model, so make sure they exist on a fresh database
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        connection.execute(text("SET enable_seqscan = off"))
+        plan = "\n".join(row[0] for row in connection.execute(text(f"EXPLAIN {sql}")))
+    print(plan)
+    used = [index for index in MATCH_QUERY_INDEXES if index in plan]
+    assert used, f"Match query does not use {MATCH_QUERY_INDEXES}:\n{plan}"
+    print(f"Match query uses: {', '.join(used)}")
+
 if __name__ == "__main__":
-    test_connection()
\ No newline at end of file
+    test_connection()
+    test_match_query_uses_indexes()
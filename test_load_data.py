@@ -0,0 +1,104 @@
+import csv
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import load_data
+from app.database import Base
+from app.models import University
+from benchmarks.generator import CSV_HEADERS, generate_universities
+
+LONG_AGO = datetime(2000, 1, 1)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'load.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture(params=["on_conflict", "portable"])
+def upsert_path(request, monkeypatch):
+    """Runs a test through INSERT ... ON CONFLICT and through the portable select/update/insert path."""
+    if request.param == "portable":
+        monkeypatch.setattr(load_data, "ON_CONFLICT_INSERTS", {})
+    return request.param
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def by_name(db):
+    return {uni.name: uni for uni in db.query(University).all()}
+
+
+def test_reload_updates_rows_in_place(db, tmp_path, upsert_path):
+    rows = list(generate_universities(20))
+    assert load_data.load_data_from_csv(db, write_csv(tmp_path / "a.csv", rows))["written"] == 20
+    before = {name: uni.id for name, uni in by_name(db).items()}
+    db.execute(update(University).values(created_at=LONG_AGO))
+    db.commit()
+
+    rows[3] = {**rows[3], "academic_rigor": "1" if rows[3]["academic_rigor"] != "1" else "2"}
+    rows.append({**rows[0], "university_name": "Brand New University"})
+    stats = load_data.load_data_from_csv(db, write_csv(tmp_path / "b.csv", rows))
+    db.expire_all()
+
+    after = by_name(db)
+    assert stats["written"] == 21 and stats["failed"] == 0
+    assert len(after) == 21
+    assert {name: after[name].id for name in before} == before
+    assert str(after[rows[3]["university_name"]].academic_rigor) == rows[3]["academic_rigor"]
+    # Only rows whose values changed are stamped, so the catalog refresher re-reads just those
+    touched = {name for name, uni in after.items() if uni.created_at.replace(tzinfo=None) != LONG_AGO}
+    assert touched == {rows[3]["university_name"], "Brand New University"}
+
+
+def test_commits_once_per_chunk(db, tmp_path, monkeypatch):
+    commits = []
+    commit = db.commit
+    monkeypatch.setattr(db, "commit", lambda: (commits.append(1), commit())[1])
+
+    stats = load_data.load_data_from_csv(db, write_csv(tmp_path / "a.csv", generate_universities(20)), chunk_size=7)
+
+    assert stats["written"] == 20
+    assert len(commits) == 3
+    assert db.query(University).count() == 20
+
+
+def test_bad_rows_only_cost_themselves(db, tmp_path, upsert_path):
+    rows = list(generate_universities(20))
+    bad = {rows[5]["university_name"], rows[12]["university_name"]}
+    rows[5] = {**rows[5], "academic_rigor": "9"}  # violates the 1-5 check constraint
+    rows[12] = {**rows[12], "sports_facilities": "0"}
+
+    stats = load_data.load_data_from_csv(db, write_csv(tmp_path / "a.csv", rows), chunk_size=8)
+
+    assert (stats["written"], stats["failed"]) == (18, 2)
+    names = set(by_name(db))
+    assert len(names) == 18
+    assert not names & bad
+
+
+def test_systemic_errors_abort_the_load(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")  # no tables
+    session = sessionmaker(bind=engine)()
+    attempts = []
+    upsert = load_data.upsert_universities
+    monkeypatch.setattr(load_data, "upsert_universities", lambda db, rows: (attempts.append(len(rows)), upsert(db, rows)))
+
+    with pytest.raises(OperationalError):
+        load_data.load_data_from_csv(session, write_csv(tmp_path / "a.csv", generate_universities(50)), chunk_size=10)
+    assert attempts == [10]
+    session.close()
@@ -0,0 +1,79 @@
+import csv
+import json
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import match_cohort
+from benchmarks.generator import generate_preferences
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def responses_path(make_university_db, monkeypatch, tmp_path):
+    db = make_university_db(200, seed=31)
+    monkeypatch.setattr(match_cohort, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    responses = generate_preferences(40, seed=5)
+    # No university has this specialty, so response 4 gets no matches at all
+    responses[3] = {**responses[3], "specialties": ["Astrology"]}
+    path = tmp_path / "responses.jsonl"
+    path.write_text("".join(json.dumps(response) + "\n" for response in responses))
+    return str(path)
+
+
+def run(input_path: str, output_path, fmt: str):
+    return match_cohort.run(input_path, str(output_path), fmt, limit=3, workers=2, chunk_size=5,
+                            id_field=None, checkpoint_path=f"{output_path}.checkpoint")
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_resumed_run_matches_an_uninterrupted_one(responses_path, tmp_path, monkeypatch, fmt):
+    expected = tmp_path / f"expected.{fmt}"
+    run(responses_path, expected, fmt)
+
+    output = tmp_path / f"resumed.{fmt}"
+    write_checkpoint = match_cohort.write_checkpoint
+    checkpoints = []
+
+    def interrupt_after_three_chunks(*args):
+        if len(checkpoints) == 3:
+            raise Interrupted()
+        checkpoints.append(args)
+        write_checkpoint(*args)
+
+    monkeypatch.setattr(match_cohort, "write_checkpoint", interrupt_after_three_chunks)
+    with pytest.raises(Interrupted):
+        run(responses_path, output, fmt)
+    monkeypatch.setattr(match_cohort, "write_checkpoint", write_checkpoint)
+
+    # The fourth chunk was written but not checkpointed; the rerun replaces it
+    assert match_cohort.read_checkpoint(f"{output}.checkpoint", responses_path, str(output))[0] == 15
+    assert run(responses_path, output, fmt)["processed"] == 25
+    assert output.read_bytes() == expected.read_bytes()
+
+
+def test_csv_lists_responses_without_matches(responses_path, tmp_path):
+    output = tmp_path / "matches.csv"
+    run(responses_path, output, "csv")
+
+    with open(output, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert {row["response_id"] for row in rows} == {str(number) for number in range(1, 41)}
+    no_matches = [row for row in rows if row["response_id"] == "4"]
+    assert len(no_matches) == 1
+    assert no_matches[0]["rank"] == no_matches[0]["university_id"] == ""
+
+
+def test_checkpoint_without_its_output_starts_over(responses_path, tmp_path):
+    expected = tmp_path / "expected.jsonl"
+    run(responses_path, expected, "jsonl")
+
+    output = tmp_path / "matches.jsonl"
+    run(responses_path, output, "jsonl")
+    output.unlink()
+
+    assert run(responses_path, output, "jsonl")["processed"] == 40
+    assert output.read_bytes() == expected.read_bytes()
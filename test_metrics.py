@@ -0,0 +1,20 @@
+from app import metrics
+from app.metrics import operation_label, register_known_operations
+
+
+def test_operation_labels_are_bounded(monkeypatch):
+    monkeypatch.setattr(metrics, "_known_operations", set())
+    monkeypatch.setattr(metrics, "_seen_operations", set())
+    monkeypatch.setattr(metrics, "METRICS_MAX_OPERATION_LABELS", 2)
+    register_known_operations(["MatchUniversities"])
+
+    assert operation_label(None) == "anonymous"
+    assert operation_label("MatchUniversities") == "MatchUniversities"
+    # The first names seen get their own label and keep it
+    assert operation_label("Facets") == "Facets"
+    assert operation_label("Search") == "Search"
+    assert operation_label("Facets") == "Facets"
+    # Later ones share the overflow bucket, registered names never do
+    assert operation_label("Random123") == "other"
+    register_known_operations(["Ranked"])
+    assert operation_label("Ranked") == "Ranked"
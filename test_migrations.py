@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateTable
+
+from app.database import Base
+from app.models import University
+
+
+def upgrade(url: str):
+    config = Config("alembic.ini")
+    config.set_main_option("sqlalchemy.url", url)
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+
+def rigor_checks(engine):
+    return [check for check in inspect(engine).get_check_constraints("universities")
+            if "academic_rigor" in check["sqltext"]]
+
+
+def test_upgrade_adds_the_created_at_index_and_rigor_check(tmp_path):
+    path = tmp_path / "old.db"
+    # A table created before the index and without the (misspelt) academic_rigor check
+    ddl = str(CreateTable(University.__table__).compile(dialect=sqlite.dialect()))
+    with sqlite3.connect(path) as connection:
+        connection.execute(ddl.replace(" CHECK (academic_rigor BETWEEN 1 AND 5)", ""))
+        connection.execute("INSERT INTO universities (name, geopolitical_region, state, specialty, ownership) "
+                           "VALUES ('University of Ibadan', 'South West', 'Oyo', 'Conventional', 'Federal')")
+    connection.close()
+
+    upgrade(f"sqlite:///{path}")
+
+    engine = create_engine(f"sqlite:///{path}")
+    assert "ix_universities_created_at" in {index["name"] for index in inspect(engine).get_indexes("universities")}
+    assert len(rigor_checks(engine)) == 1
+    # The table recreate kept the other checks and the data
+    assert len(inspect(engine).get_check_constraints("universities")) == 6
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT name FROM universities").fetchall() == [("University of Ibadan",)]
+        with pytest.raises(sqlite3.IntegrityError):
+            connection.execute("UPDATE universities SET academic_rigor = 9")
+    connection.close()
+    engine.dispose()
+
+
+def test_upgrade_leaves_a_current_schema_alone(tmp_path):
+    url = f"sqlite:///{tmp_path / 'current.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    before = inspect(engine).get_indexes("universities"), inspect(engine).get_check_constraints("universities")
+
+    upgrade(url)
+
+    assert (inspect(engine).get_indexes("universities"), inspect(engine).get_check_constraints("universities")) == before
+    engine.dispose()
@@ -0,0 +1,100 @@
+from typing import List, Optional, Tuple
+
+import pytest
+
+from app.catalog import load_catalog
+from app.crud import get_all_universities, get_top_matches
+from app.schemas import StudentPreferenceInput
+from app.utils import (
+    COST_MATCH_BONUS, MatchCriteria, MatchSet, build_match_criteria, calculate_tuition_difference, ranges_overlap,
+)
+from benchmarks.generator import generate_preferences
+
+PAGE_SIZE = 7
+# Preferences no generated university satisfies on tuition, so the tuition-distance fallback ranks them
+FALLBACK_PREFERENCES = [
+    {"specialties": ["Conventional"], "ownerships": ["Federal"], "states": [], "regions": ["South West"],
+     "tuition_range": "Greater than 2,000,000 naira"},
+    {"specialties": ["Conventional", "Technology"], "ownerships": ["Federal", "State"], "states": ["Lagos", "Kano"],
+     "regions": [], "tuition_range": "1,000,000 - 2,000,000 naira"},
+    {"specialties": ["Conventional"], "ownerships": ["Private"], "states": [], "regions": ["North Central"],
+     "tuition_range": "Less than 100,000 naira"},
+]
+
+
+def reference_matches(universities, criteria: MatchCriteria) -> Tuple[List[Tuple[int, float]], bool]:
+    """The original row-at-a-time matching: every match, fully sorted, plus the fallback flag."""
+    academic, hostel, sports, social_life = criteria.weights
+    primary = [
+        uni for uni in universities
+        if uni.specialty in criteria.specialties and uni.ownership in criteria.ownerships
+        and (uni.state in criteria.states or uni.geopolitical_region in criteria.regions)
+    ]
+    matches = []
+    for uni in primary:
+        if ranges_overlap(*criteria.tuition_range, uni.tuition_min, uni.tuition_max):
+            score = (academic * (uni.academic_rigor or 0) + hostel * (uni.hostel_quality or 0)
+                     + sports * (uni.sports_facilities or 0) + social_life * (uni.social_life or 0))
+            if ranges_overlap(*criteria.cost_range, uni.cost_of_living_min, uni.cost_of_living_max):
+                score += COST_MATCH_BONUS
+            matches.append((uni.id, float(score)))
+    fallback = not matches and bool(primary)
+    if fallback:
+        matches = [(uni.id, 0.0 - calculate_tuition_difference(*criteria.tuition_range, uni.tuition_min,
+                                                               uni.tuition_max))
+                   for uni in primary]
+    matches.sort(key=lambda match: (-match[1], match[0]))
+    return matches, fallback
+
+
+def walk_pages(fetch) -> Tuple[List[Tuple[int, float]], List[MatchSet]]:
+    """Follows (score, id) cursors from the first page until has_next_page is false."""
+    matches: List[Tuple[int, float]] = []
+    pages: List[MatchSet] = []
+    after: Optional[Tuple[float, int]] = None
+    while True:
+        page = fetch(after)
+        pages.append(page)
+        matches.extend(page.matches)
+        assert len(page.matches) <= PAGE_SIZE
+        if not page.has_next_page:
+            return matches, pages
+        assert len(page.matches) == PAGE_SIZE
+        uni_id, score = page.matches[-1]
+        after = (score, uni_id)
+        assert len(pages) <= 1000, "pagination does not terminate"
+
+
+@pytest.fixture(scope="module")
+def university_db(make_university_db):
+    return make_university_db(1000)
+
+
+def all_preferences() -> List[MatchCriteria]:
+    preferences = generate_preferences(300)
+    for overrides in FALLBACK_PREFERENCES:
+        preferences.append({**preferences[0], **overrides})
+    return [build_match_criteria(StudentPreferenceInput(**p)) for p in preferences]
+
+
+@pytest.mark.parametrize("engine", ["catalog", "sql"])
+def test_every_page_matches_a_full_sort(university_db, engine):
+    universities = get_all_universities(university_db)
+    catalog = load_catalog(university_db)
+    fallbacks = 0
+    for criteria in all_preferences():
+        if engine == "catalog":
+            fetch = lambda after: catalog.match(criteria, limit=PAGE_SIZE, after=after)
+        else:
+            fetch = lambda after: get_top_matches(university_db, criteria, limit=PAGE_SIZE, after=after)
+        expected, fallback = reference_matches(universities, criteria)
+
+        walked, pages = walk_pages(fetch)
+
+        assert walked == expected, criteria
+        for page in pages:
+            assert page.fallback == fallback, criteria
+            if expected:
+                assert page.total_count == len(expected), criteria
+        fallbacks += fallback
+    assert fallbacks >= len(FALLBACK_PREFERENCES)
@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import persisted_queries as persisted_queries_module
+from app.main import app
+from app.persisted_queries import PersistedQueryStore, query_hash
+
+PING = "query Ping { __typename }"
+
+
+def post(client: TestClient, query=None, sha256=None) -> dict:
+    body = {}
+    if query is not None:
+        body["query"] = query
+    if sha256 is not None:
+        body["extensions"] = {"persistedQuery": {"version": 1, "sha256Hash": sha256}}
+    response = client.post("/graphql", json=body)
+    assert response.status_code == 200
+    return response.json()
+
+
+def error_code(result: dict) -> str:
+    return result["errors"][0]["extensions"]["code"]
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = PersistedQueryStore(maxsize=10)
+    monkeypatch.setattr(persisted_queries_module, "persisted_queries", store)
+    monkeypatch.setattr(persisted_queries_module, "PERSISTED_QUERIES_MODE", "apq")
+    return store
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_unknown_hash_asks_for_the_query(store, client, caplog):
+    result = post(client, sha256=query_hash(PING))
+    assert error_code(result) == "PERSISTED_QUERY_NOT_FOUND"
+    # A normal step of the protocol, not an error worth a traceback
+    assert not [record for record in caplog.records if record.name.startswith("strawberry")]
+
+
+def test_registered_query_runs_from_its_hash(store, client):
+    digest = query_hash(PING)
+    assert post(client, query=PING, sha256=digest) == {"data": {"__typename": "Query"}}
+    assert store.get(digest).validated
+
+    assert post(client, sha256=digest) == {"data": {"__typename": "Query"}}
+    assert store.stats()["registered"] == 1
+
+
+def test_hash_mismatch_is_rejected(store, client):
+    result = post(client, query=PING, sha256=query_hash("query Other { __typename }"))
+    assert error_code(result) == "PERSISTED_QUERY_HASH_MISMATCH"
+    assert store.stats()["registered"] == 0
+
+
+def test_allowlist_rejects_unlisted_operations(monkeypatch, client):
+    store = PersistedQueryStore(maxsize=10, allowlist={query_hash(PING): PING})
+    monkeypatch.setattr(persisted_queries_module, "persisted_queries", store)
+    monkeypatch.setattr(persisted_queries_module, "PERSISTED_QUERIES_MODE", "allowlist")
+
+    assert error_code(post(client, query="query Other { __typename }")) == "OPERATION_NOT_ALLOWLISTED"
+    assert post(client, query=PING) == {"data": {"__typename": "Query"}}
+    assert post(client, sha256=query_hash(PING)) == {"data": {"__typename": "Query"}}
+    assert store.stats()["registered"] == 0
+
+
+def test_invalid_documents_are_never_marked_validated(store, client):
+    invalid = "query Broken { noSuchField }"
+    for _ in range(2):
+        # Still rejected the second time: validation isn't skipped for a known document
+        result = post(client, query=invalid)
+        assert "noSuchField" in result["errors"][0]["message"]
+    assert not store.get(query_hash(invalid)).validated
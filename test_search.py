@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from sqlalchemy import func, update
+
+from app.core.config import CATALOG_RECONCILE_INTERVAL
+from app.models import University
+from app.search import NameIndex, _names_unchanged, _read_names
+
+
+def build_index(db) -> NameIndex:
+    watermark, rows = _read_names(db)
+    index = NameIndex.build(rows)
+    index.watermark = watermark
+    return index
+
+
+def test_name_index_survives_changes_that_keep_names(make_university_db):
+    db = make_university_db(200, seed=4)
+    index = build_index(db)
+    university = db.query(University).order_by(University.id).first()
+
+    university.academic_rigor = 1 if university.academic_rigor != 1 else 2
+    university.state = "Atlantis"
+    db.commit()
+    assert _names_unchanged(db, index)
+
+    university.name = "University of Atlantis"
+    db.commit()
+    assert not _names_unchanged(db, index)
+
+
+def test_name_index_rebuilds_for_new_and_deleted_universities(make_university_db):
+    db = make_university_db(200, seed=4)
+    index = build_index(db)
+    db.add(University(name="University of Lagos", geopolitical_region="South West", state="Lagos",
+                      specialty="Conventional", ownership="Federal"))
+    db.commit()
+    assert not _names_unchanged(db, index)
+
+    index = build_index(db)
+    lagos = db.query(University).filter(University.name == "University of Lagos").one()
+    assert index.search("unilag", limit=1)[0][0] == lagos.id
+    db.delete(lagos)
+    db.commit()
+    assert not _names_unchanged(db, index)
+
+
+def test_name_index_is_rebuilt_once_per_reconcile_interval(make_university_db):
+    db = make_university_db(200, seed=4)
+    index = build_index(db)
+    # A rename stamped before the index's watermark: only the periodic rebuild catches it
+    oldest = db.query(func.min(University.created_at)).scalar()
+    first_id = db.query(func.min(University.id)).scalar()
+    db.execute(update(University).where(University.id == first_id)
+               .values(name="University of Atlantis", created_at=oldest - timedelta(hours=1)))
+    db.commit()
+    assert _names_unchanged(db, index)
+
+    index.built_at -= CATALOG_RECONCILE_INTERVAL
+    assert not _names_unchanged(db, index)
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from app.catalog import attach_shared_catalog, load_catalog, publish_catalog
+from app.shared_catalog import SharedCatalogStore
+from test_catalog_refresh import as_rows, assert_same_catalog, decoded, edit
+
+
+@pytest.fixture(scope="module")
+def university_db(make_university_db):
+    return make_university_db(300, seed=21)
+
+
+def snapshots(store: SharedCatalogStore):
+    return sorted(entry for entry in os.listdir(store.directory) if entry.startswith("v"))
+
+
+def test_attached_snapshot_matches_like_the_original(university_db, tmp_path):
+    store = SharedCatalogStore(str(tmp_path))
+    assert attach_shared_catalog(store=store) is None
+
+    catalog = load_catalog(university_db)
+    name = publish_catalog(catalog, store=store)
+    attached = attach_shared_catalog(store=store)
+
+    assert attached.snapshot["name"] == name
+    assert attached.snapshot["version"] == 1
+    assert attached.watermark == catalog.watermark
+    assert_same_catalog(attached, catalog)
+    # Nothing new to map while CURRENT still names the known snapshot
+    assert attach_shared_catalog(name, store=store) is None
+
+
+def test_publishing_changes_bumps_the_version(university_db, tmp_path):
+    store = SharedCatalogStore(str(tmp_path))
+    publish_catalog(load_catalog(university_db), store=store)
+    attached = attach_shared_catalog(store=store)
+
+    rows = as_rows(university_db)
+    changes = [edit(rows[0], state="Atlantis", geopolitical_region="Offshore"), edit(rows[7], academic_rigor=1)]
+    # with_rows copies the read-only memory-mapped arrays it changes
+    updated = attached.with_rows(changes)
+    publish_catalog(updated, [row.id for row in changes], store=store)
+    reattached = attach_shared_catalog(attached.snapshot["name"], store=store)
+
+    assert reattached.snapshot["version"] == attached.snapshot["version"] + 1
+    assert reattached.snapshot["changed_ids"] == [rows[0].id, rows[7].id]
+    assert_same_catalog(reattached, updated)
+    assert decoded(reattached)[rows[0].id] != decoded(attached)[rows[0].id]
+
+
+def test_old_snapshots_are_removed(university_db, tmp_path):
+    store = SharedCatalogStore(str(tmp_path), keep=2)
+    catalog = load_catalog(university_db)
+    names = [publish_catalog(catalog, store=store) for _ in range(4)]
+
+    assert snapshots(store) == names[-2:]
+    assert attach_shared_catalog(store=store).snapshot["version"] == 4
+
+
+def test_one_leader_per_directory(tmp_path):
+    leader = SharedCatalogStore(str(tmp_path))
+    follower = SharedCatalogStore(str(tmp_path))
+
+    assert leader.try_lead()
+    assert leader.try_lead()
+    assert not follower.try_lead()
+
+    # Leadership is released with the leader's lock file, i.e. when its process exits
+    leader._leader_file.close()
+    assert follower.try_lead()